@@ -14,6 +14,8 @@ import numpy as np
 
 # Instantiate
 s = SystemClient.from_json_file("localhost", "D:/control_software/devserve - newdriver/examples/device_configuration.json")
+# Scan commands queue behind interactive requests, ahead of telemetry
+s.set_priority('scan')
 
 from States.MeasureRun import *
 
@@ -30,7 +32,12 @@ exp = input("Spectrograph exposure time: ")
 slit = input("Spectrograph slit width: ")
 spec_wave = input("Spectrograph wavelength: ")
 
+# Meter B averages readings (each of power_count hardware samples) until
+# their standard error is below power_precision of the value, for at most
+# power_budget seconds
 power_count = 10
+power_precision = 1e-3
+power_budget = 5.0
 
 print()
 print("Finished taking inputs. ")
@@ -67,36 +74,18 @@ for wl in wl_range:
     
     print(str(count) +". Wavelength currently being set to: " + str(round(wl,1)) + "nm.")
     
-    s.horiba.wl = round(wl,1)
-    s.power_meter_b.wavelength = round(wl,1)
-
     new_state = exc_rules(wl)
     print(f"State updating to: Spectro grating={new_state[0]}, SPFW={new_state[1]}, LPFW={new_state[2]}, LPFW2={new_state[3]}, Mono grating={new_state[4]}")
-    
-    if new_state[0] == state[0]:
-        pass
-    else:
-        s.spectro.grating = new_state[0]
-        
-    if new_state[1] == state[1]:
-        pass
-    else:
-        s.spfw.position = new_state[1]
-    
-    if new_state[2] == state[2]:
-        pass
-    else:
-        s.lpfw.position = new_state[2]
-        
-    if new_state[3] == state[3]:
-        pass
-    else:
-        s.lpfw2.position = new_state[3]
-        
-    if new_state[4] == state[4]:
-        pass
-    else:
-        s.horiba.gr = new_state[4]
+
+    # Unchanged settings are skipped; the devices move in parallel
+    s.apply_state({
+        'horiba': {'wl': round(wl,1), 'gr': new_state[4]},
+        'power_meter_b': {'wavelength': round(wl,1)},
+        'spectro': {'grating': new_state[0]},
+        'spfw': {'position': new_state[1]},
+        'lpfw': {'position': new_state[2]},
+        'lpfw2': {'position': new_state[3]},
+    })
     
     state = new_state
     
@@ -114,17 +103,22 @@ for wl in wl_range:
 
     #s.power_meter_a.recording = False
     #powerval = s.power_meter_a.buffer_stats[2]
-    powerval = s.power_meter_b.power
+    try:
+        reading = s.power_meter_b.call('read_adaptive', precision=power_precision,
+                                       time_budget=power_budget)
+    except Exception as e:
+        print(f'Power reading failed: {e}')
+        reading = {'value': None, 'n': 0, 'sem': None, 'rel_sem': None}
+    powerval = reading['value']
 
     s.source_shutter.on = False
 
     #power meter unit
     powerunit = s.power_meter_b.unit
 
-    # save signal
-    filename = os.path.join(RAW_path,rf"{count}_{crystal}.txt")
-    s.spectro.save_path = filename
-    s.spectro.saved = True
+    # fetch the signal straight from the spectrometer server
+    spectrum = s.spectro.spectrum
+    header = s.spectro.spectrum_header
 
     # write more metadata
     data = ''
@@ -138,18 +132,17 @@ for wl in wl_range:
     data += 'mono_grating: '+ str(state[4]) +'\n'
     data += 'mono_wavelength: '+ str(round(wl,1)) +'\n'
     data += 'spectro_grating: '+ str(state[0]) +'\n'
+    # After the fixed layout, so the lines above keep their numbers
+    data += 'pm_n: '+str(reading['n']) +'\n'
+    data += 'pm_rel_sem: '+str(reading['rel_sem']) +'\n'
     data+='\n'
+    data+=header
 
-    with open(filename,'r') as fp:
-        data2 = fp.read()
-    data+=data2
-
+    # single write of metadata and signal
     merged_path = os.path.join(RAW_path,rf'{count}-{crystal}.txt')
-    merged = open(merged_path,'x')
-    with open(merged_path,'w') as fp:
+    with open(merged_path,'x') as fp:
         fp.write(data)
-
-    os.remove(filename)
+        np.savetxt(fp, spectrum.T, fmt='%.7g')
 
 
     # IMPORTANT!!! PROGRAM GETS SLOW OTHERWISE
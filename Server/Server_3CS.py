@@ -1,14 +1,41 @@
 import json
 import argparse
 import devserve
-from devserve.servers import DeviceServer
+from devserve.servers import DeviceServer, DeviceGateway
+from devserve.registry import DEFAULT_PATH, Registry
 from devserve.devices import device_directory
 import time
 from multiprocessing import Process
 cfgs = []
 import os
 
+
+def run_gateway(cfgs, host, port, registry=None):
+    devices = {}
+    shadow = {cfg["name"]: cfg.get("shadow") for cfg in cfgs}
+    for cfg in cfgs:
+        try:
+            devices[cfg["name"]] = device_directory[cfg["device"]](**cfg)
+        except:
+            print(f"  !!!FAIL!!! could not create device {cfg['name']}...")
+    # Also listen on the per-device ports so SystemClient.from_json_file keeps working
+    aliases = [port+i for i in range(len(cfgs))]
+    gateway = DeviceGateway(host, port, devices, aliases=aliases, shadow=shadow, registry=registry)
+    print(f"starting gateway for {len(devices)} devices...")
+    gateway.run()
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--gateway', action='store_true',
+                        help='host every device in this process behind one port')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--registry', nargs='?', const=DEFAULT_PATH, default=None,
+                        help='publish the devices to a registry directory that clients discover '
+                             f'them from (default {DEFAULT_PATH})')
+    args = parser.parse_args()
+    registry = Registry(args.registry) if args.registry else None
+
     print(devserve.__file__)
     dir_path = os.path.dirname(os.path.realpath(__file__))
     #cfg_path = os.path.join(dir_path, "dev_config.json")
@@ -20,11 +47,15 @@ if __name__ == '__main__':
     servers = []
     host = 'localhost'
 
+    if args.gateway:
+        run_gateway(cfgs, host, args.port, registry)
+        raise SystemExit
+
     for i, cfg in enumerate(cfgs):
-        port = 5000+i
+        port = args.port+i
         try:
             device = device_directory[cfg["device"]](**cfg)
-            server = DeviceServer(cfg["name"], host, port, device)
+            server = DeviceServer(cfg["name"], host, port, device, shadow=cfg.get("shadow"), registry=registry)
             p = Process(target=server.run)
             print(f"starting device server for {cfg['name']}...")
             p.daemon = True
@@ -10,13 +10,6 @@
 # Devserve
 from devserve.clients import SystemClient
 
-# power meter libraries
-import visa
-from ThorlabsPM100 import ThorlabsPM100
-
-# Horiba
-import usb.core
-import struct
 import time
 
 # OS
@@ -25,7 +18,6 @@ import json
 from datetime import datetime
 import re
 import numpy as np
-import matplotlib.pyplot as plt
 
 #s = SystemClient.from_json_file("localhost", "D:3CS/CTRL/Server/dev_config.json")
 
@@ -143,16 +135,17 @@ def exc_rules(wl):
 
 # gets the system to a predefined initial state
 def zero_system(s):
-    s.source_shutter.control = "computer"
-    s.source_shutter.on = False
-    s.spectro.shutter = "closed"
-    s.spfw.position = 6
-    s.lpfw.position = 6
-    s.lpfw2.position = 6
-    s.flipper.position = "down"
-    s.flipperB.position = 'down'
-    s.horiba.gr = 0
-    s.horiba.wl = 250
+    # Shutters close first, then everything else moves at once
+    s.apply_state({
+        'source_shutter': {'control': "computer", 'on': False},
+        'spectro': {'shutter': "closed"},
+        'spfw': {'position': 6},
+        'lpfw': {'position': 6},
+        'lpfw2': {'position': 6},
+        'flipper': {'position': "down"},
+        'flipperB': {'position': 'down'},
+        'horiba': {'gr': 0, 'wl': 250},
+    }, stages=[['source_shutter', 'spectro.shutter']])
     print("System zeroed.")
     print(get_state(s))
 
@@ -199,6 +192,7 @@ def poly4(x,a,b,c,d,e):
 
 # function that plots from spectrometer measurement
 def signal_plot(path,startline,color):
+    import matplotlib.pyplot as plt
     sig = open(path,'r')
     x = []
     y = []
@@ -382,6 +376,7 @@ def Noise_Cancellation(sig_path,noise_dict_path,save_path):
 # this functions runs a full correlation study for the power meter correlations
 # takes in the run ID and returns 
 def Power_Run(s):
+    import matplotlib.pyplot as plt
 
     path0 = 'D:\\3CS\\DATA\\PowerCorrelations'
 
@@ -435,10 +430,11 @@ def Power_Run(s):
             s.power_meter_a.wavelength = round(wl,1)
             s.power_meter_b.wavelength = round(wl,1)
 
-            #get power reading
+            #get power reading, both meters at once
             print('Getting power...')
-            power_read_a = s.power_meter_a.power
-            power_read_b = s.power_meter_b.power
+            record = s.read_paired(('power_meter_a', 'power_meter_b'))
+            power_read_a = record['power_meter_a']
+            power_read_b = record['power_meter_b']
 
             #save measurement
             print('Saving ...')
@@ -0,0 +1,61 @@
+"""
+Per-request CPU cost of value handling, old guesswork vs schema codec.
+
+  client: json-decode the body twice and literal_eval the value
+          vs. one json decode and the attribute's precompiled decoder
+  server: literal_eval every PUT value vs. the typed decoder
+
+    python benchmarks/bench_codec.py [--n 100000]
+"""
+import argparse
+import ast
+import json
+import timeit
+
+from devserve.codec import Codec
+from devserve.devices.thorlabs.fw102c import FW102C
+from devserve.devices.andor.solis_proxy import SolisProxy
+
+# (device class, attribute, body sent by the server, value PUT by a client)
+CASES = [
+    (FW102C, 'position', {"name": "position", "value": "6"}, '6'),
+    (SolisProxy, 'wavelength', {"name": "wavelength", "value": 532.25}, '532.25'),
+    (SolisProxy, 'save_path', {"name": "save_path", "value": "D:\\3CS\\DATA\\x.txt"}, 'D:\\3CS\\DATA\\x.txt'),
+]
+
+
+def old_client(text):
+    val = None
+    try:
+        val = json.loads(text).get('value', None)
+    except:
+        pass
+    try:
+        val = ast.literal_eval(json.loads(text).get('value', None))
+    except:
+        pass
+    return val
+
+
+def old_server(value):
+    try:
+        return ast.literal_eval(value)
+    except:
+        return value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=100000)
+    args = parser.parse_args()
+
+    for cls, attr, body, put in CASES:
+        codec = Codec(cls.describe())
+        text = json.dumps(body)
+        t_old = timeit.timeit(lambda: old_client(text), number=args.n) / args.n
+        t_new = timeit.timeit(lambda: codec.decode(attr, json.loads(text).get('value', None)),
+                              number=args.n) / args.n
+        s_old = timeit.timeit(lambda: old_server(put), number=args.n) / args.n
+        s_new = timeit.timeit(lambda: codec.decode(attr, put), number=args.n) / args.n
+        print(f'{cls.__name__}.{attr:<11} client {1e6*t_old:6.2f} -> {1e6*t_new:6.2f} us   '
+              f'server {1e6*s_old:6.2f} -> {1e6*s_new:6.2f} us')
@@ -0,0 +1,85 @@
+"""
+EQ77 power ramp time against ramp distance, using a simulated source
+on a pseudo-terminal (POSIX only). The old ramp, one read-back step
+every 0.2 s, is timed alongside the pipelined one.
+
+    python benchmarks/bench_eq77.py [--latency 0.015] [--distances 0 1 5 20 85]
+"""
+import argparse
+import os
+import threading
+import time
+import tty
+
+from devserve.devices.energetiq.eq77 import EQ77
+
+
+class SimulatedEQ77:
+    """
+    Answers the single-character U/D/Q commands in order, each after
+    `latency` seconds, with the power reading the real source prints.
+    """
+    def __init__(self, power=15, latency=0.015):
+        self.power = power
+        self.latency = latency
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                data = os.read(self.master, 64)
+            except OSError:
+                return
+            for q in data.decode('ascii', 'ignore'):
+                if q not in 'UDQ':
+                    continue
+                time.sleep(self.latency)
+                if q == 'U':
+                    self.power = min(self.power + 1, 100)
+                elif q == 'D':
+                    self.power = max(self.power - 1, 15)
+                os.write(self.master, f'Power = {self.power} %\r\n'.encode())
+
+
+def old_ramp(en, pwr):
+    p = en.power
+    while True:
+        if p == pwr:
+            break
+        elif p > pwr:
+            p = en.query('D')
+        elif p < pwr:
+            p = en.query('U')
+        time.sleep(0.2)
+
+
+def new_ramp(en, pwr):
+    en.power = pwr
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.015)
+    parser.add_argument('--distances', type=int, nargs='+', default=[0, 1, 5, 20, 85])
+    parser.add_argument('--skip-old', action='store_true')
+    args = parser.parse_args()
+
+    sim = SimulatedEQ77(latency=args.latency)
+    en = EQ77(com=sim.port)
+    en.connect()
+    ramps = [('pipelined', new_ramp)] if args.skip_old else [('one step', old_ramp), ('pipelined', new_ramp)]
+    print(f'{"distance":>8}' + ''.join(f'{label:>12}' for label, _ in ramps))
+    for d in args.distances:
+        row = f'{d:>8}'
+        for label, ramp in ramps:
+            sim.power = 15
+            t0 = time.perf_counter()
+            ramp(en, 15 + d)
+            elapsed = time.perf_counter() - t0
+            assert sim.power == 15 + d, (label, sim.power)
+            row += f'{elapsed:>10.2f} s'
+        print(row)
+    print(en.io_stats)
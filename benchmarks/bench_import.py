@@ -0,0 +1,54 @@
+"""
+Cold-start import cost of the client-side modules.
+
+Each module is imported in a fresh interpreter under `-X importtime`;
+the table shows the median total import time and the heaviest
+third-party packages pulled in along the way. Nothing should touch
+the network or the D: drive.
+
+    python benchmarks/bench_import.py [--runs 5] [module ...]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['devserve.clients', 'devserve.async_clients', 'lib3CS.lib3CS', 'States.MeasureRun']
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(module):
+    """{package: cumulative us} for one cold import of `module`."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, cwd=ROOT, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            times[m.group(4)] = int(m.group(2))
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        try:
+            runs = [import_times(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f'{module:<24} failed: {e}')
+            continue
+        total = statistics.median(run[module] for run in runs) / 1000
+        heavy = sorted(((t, name) for name, t in runs[-1].items()
+                        if '.' not in name and name != module.split('.')[0]), reverse=True)[:4]
+        print(f'{module:<24} {total:8.1f} ms   '
+              + ', '.join(f'{name} {t / 1000:.0f}' for t, name in heavy))
@@ -0,0 +1,73 @@
+"""
+Round-trip latency of DeviceClient attribute reads against a
+Debugger device server, with and without a keep-alive session.
+
+    python benchmarks/bench_keepalive.py [--n 500] [--port 5099]
+"""
+import argparse
+import statistics
+import time
+from multiprocessing import Process
+
+import requests
+
+from devserve.clients import DeviceClient, make_session
+from devserve.devices.device import Debugger
+from devserve.servers import DeviceServer
+
+
+class _NoSession:
+    """Module-level requests calls, i.e. a new connection per request."""
+    get = staticmethod(requests.get)
+    put = staticmethod(requests.put)
+    request = staticmethod(requests.request)
+
+
+def serve(port):
+    DeviceServer('debugger', 'localhost', port, Debugger()).run()
+
+
+def wait_for(addr, timeout=10):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        try:
+            requests.get(f'{addr}/echo', timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server at {addr} did not start')
+
+
+def timeit(client, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        client.echo
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def report(label, samples):
+    ms = [1e3 * s for s in samples]
+    print(f'{label:>12}: mean {statistics.mean(ms):7.3f} ms  '
+          f'median {statistics.median(ms):7.3f} ms  '
+          f'p95 {sorted(ms)[int(0.95 * len(ms))]:7.3f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=500)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    addr = f'http://localhost:{args.port}/debugger'
+    p = Process(target=serve, args=(args.port,), daemon=True)
+    p.start()
+    try:
+        wait_for(addr)
+        before = timeit(DeviceClient('debugger', addr, session=_NoSession()), args.n)
+        after = timeit(DeviceClient('debugger', addr, session=make_session()), args.n)
+        report('per-request', before)
+        report('keep-alive', after)
+    finally:
+        p.terminate()
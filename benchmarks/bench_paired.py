@@ -0,0 +1,72 @@
+"""
+Per-wavelength meter time of take_power: two PM100 servers on the TLPM
+backend over FakeTLPM, each reading taking `latency` seconds, read one
+after the other (the old loop) and with SystemClient.read_paired.
+
+    python benchmarks/bench_paired.py [--n 20] [--latency 0.1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import requests
+
+from fake_tlpm import FakeTLPM
+from devserve.clients import DeviceClient, SystemClient
+from devserve.devices.thorlabs.pm100 import PM100
+from devserve.servers import DeviceServer
+
+
+def serve(name, port, latency):
+    pm = PM100(backend='tlpm', tlpm_dll=FakeTLPM(latency=latency))
+    server = DeviceServer(name, 'localhost', port, pm)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f'http://localhost:{port}/{name}'
+
+
+def wait_for(addr, timeout=10):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        try:
+            requests.get(f'{addr}/_health', timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server at {addr} did not start')
+
+
+def sequential(s):
+    t0 = time.time()
+    a = s.power_meter_a.power
+    t1 = time.time()
+    b = s.power_meter_b.power
+    return a, b, (time.time() + t1) / 2 - (t1 + t0) / 2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=5110)
+    args = parser.parse_args()
+
+    addrs = {name: serve(name, args.port + i, args.latency)
+             for i, name in enumerate(['power_meter_a', 'power_meter_b'])}
+    for addr in addrs.values():
+        wait_for(addr)
+    s = SystemClient({name: DeviceClient(name, addr) for name, addr in addrs.items()})
+
+    for label, read in [('sequential', sequential), ('read_paired', s.read_paired)]:
+        durations, skews = [], []
+        for _ in range(args.n):
+            t0 = time.perf_counter()
+            result = read(s) if read is sequential else read()
+            durations.append(time.perf_counter() - t0)
+            skews.append(result[2] if read is sequential else result['skew'])
+        print(f'{label:>12}: {1e3 * statistics.mean(durations):7.1f} ms per wavelength, '
+              f'A/B read skew {1e3 * statistics.mean(skews):7.1f} ms')
@@ -0,0 +1,41 @@
+"""
+Cost of PM100.buffer_stats as a recording grows: the old list-backed
+buffer recomputed np.mean/np.std over every sample on each call, the
+RingBuffer keeps running sums.
+
+    python benchmarks/bench_ringbuffer.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from devserve.devices.ringbuffer import RingBuffer
+
+
+def per_call(fn, n=50):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def list_stats(ts, ms):
+    return len(ts), np.mean(ts), np.mean(ms), np.std(ms)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f'{"samples":>9}{"list stats":>14}{"ring stats":>14}{"ring last 1000":>16}')
+    for size in args.sizes:
+        ts = list(time.time() + 1e-3 * np.arange(size))
+        ms = list(1e-3 + 1e-6 * np.random.randn(size))
+        rb = RingBuffer(size)
+        rb.extend(ts, ms)
+        print(f'{size:>9}'
+              f'{1e3 * per_call(lambda: list_stats(ts, ms)):>11.3f} ms'
+              f'{1e3 * per_call(rb.stats):>11.3f} ms'
+              f'{1e3 * per_call(lambda: rb.stats(1000)):>13.3f} ms')
@@ -0,0 +1,115 @@
+"""
+Per-command latency of the serial drivers before and after
+SerialTransport, against pseudo-terminal simulators of the FW102C
+filter wheel and the Solis proxy (POSIX only).
+
+    python benchmarks/bench_serial.py [--n 20]
+"""
+import argparse
+import io
+import os
+import statistics
+import threading
+import time
+import tty
+
+import serial
+
+from devserve.devices.thorlabs.fw102c import FW102C
+from devserve.devices.andor.solis_proxy import SolisProxy
+
+
+def simulate(master, reply):
+    """Answer every CR-terminated command written to the pty with reply(cmd)."""
+    buf = b''
+    while True:
+        try:
+            data = os.read(master, 1024)
+        except OSError:
+            return
+        buf += data
+        while b'\r' in buf:
+            cmd, buf = buf.split(b'\r', 1)
+            os.write(master, reply(cmd.decode()))
+
+
+def fw102c_reply(state={'pos': '1'}):
+    def reply(cmd):
+        if cmd.startswith('pos='):
+            state['pos'] = cmd[4:]
+            return f'{cmd}\r> '.encode()
+        if cmd == 'pos?':
+            return f'{cmd}\r{state["pos"]}\r> '.encode()
+        return f'{cmd}\rTHORLABS FW102C/FW212C Filter Wheel version 1.07\r> '.encode()
+    return reply
+
+
+def solis_reply(cmd):
+    return b'42\r\n'
+
+
+def open_pty(reply):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    threading.Thread(target=simulate, args=(master, reply), daemon=True).start()
+    return os.ttyname(slave)
+
+
+def timeit(fn, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def report(label, samples):
+    ms = [1e3 * s for s in samples]
+    print(f'{label:>22}: mean {statistics.mean(ms):8.2f} ms  '
+          f'median {statistics.median(ms):8.2f} ms  max {max(ms):8.2f} ms')
+
+
+def fw102c_before(port):
+    # The driver's previous read: TextIOWrapper.readlines() returns only
+    # once the port timeout expires
+    fw = serial.Serial(port, baudrate=115200, timeout=1)
+    sio = io.TextIOWrapper(io.BufferedRWPair(fw, fw, 1), newline=None, encoding='ascii')
+
+    def query():
+        sio.flush()
+        sio.write('pos?\r')
+        return sio.readlines(2048)[1][:-1]
+    return query
+
+
+def solis_before(port):
+    # The driver's previous read: a fixed 150 bytes, so every reply waits
+    # out the 0.2 s timeout
+    conn = serial.Serial(port, baudrate=115200, timeout=0.2)
+
+    def query():
+        conn.write(b'GetExposure\r')
+        return conn.read(150).strip().decode()
+    return query
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=20)
+    args = parser.parse_args()
+
+    fw_port = open_pty(fw102c_reply())
+    report('FW102C pos? before', timeit(fw102c_before(fw_port), args.n))
+    fw = FW102C(com=fw_port)
+    fw.connect()
+    report('FW102C pos? after', timeit(lambda: fw.position, args.n))
+    report('FW102C pos= after', timeit(lambda: setattr(fw, 'position', 2), args.n))
+    print('   ', fw.io_stats)
+
+    solis_port = open_pty(solis_reply)
+    report('Solis query before', timeit(solis_before(solis_port), args.n))
+    solis = SolisProxy(com=solis_port)
+    solis.connect()
+    report('Solis query after', timeit(lambda: solis.query('GetExposure'), args.n))
+    print('   ', solis.io_stats)
@@ -0,0 +1,99 @@
+"""
+Per-read cost of the PM100 backends, with the instrument replaced by
+stand-ins that take the same `latency` per measurement: a fake VISA
+instrument under the ThorlabsPM100 SCPI layer, and FakeTLPM under the
+TLPM backend. Also times burst recording through the TLPM backend, and
+a 10000-sample sequence read into hand-built ctypes arrays and converted
+element by element against TLPM.powerSequence into a reused NumPy buffer.
+
+    python benchmarks/bench_tlpm.py [--n 2000] [--latency 0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ctypes import c_double, c_int
+
+import numpy as np
+
+from fake_tlpm import FakeTLPM
+from devserve.TLPM import TLPM
+from devserve.devices.thorlabs.pm100 import PM100, ScpiMeter
+
+
+class FakeInstrument:
+    """Answers SCPI queries the way a PM100 over USBTMC does, as text."""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def query(self, cmd):
+        if self.latency:
+            time.sleep(self.latency)
+        return '1.000000E-3\n'
+
+    def write(self, cmd):
+        pass
+
+
+def scpi_meter(latency):
+    from ThorlabsPM100 import ThorlabsPM100
+    meter = ScpiMeter.__new__(ScpiMeter)
+    meter.pm = ThorlabsPM100(inst=FakeInstrument(latency))
+    meter._sequencer = None
+    return meter
+
+
+def ctypes_sequence(tlpm, n):
+    values = (c_double * n)()
+    tlpm.getPowerMeasurementSequence(c_int(n), c_int(0), values)
+    return [values[i] for i in range(n)]
+
+
+def timeit(fn, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def report(label, samples):
+    us = [1e6 * s for s in samples]
+    print(f'{label:>16}: mean {statistics.mean(us):9.1f} us  median {statistics.median(us):9.1f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    visa_pm = PM100()
+    visa_pm.pm = scpi_meter(args.latency)
+    tlpm_pm = PM100(backend='tlpm', tlpm_dll=FakeTLPM(latency=args.latency))
+    tlpm_pm.connect()
+
+    report('visa power', timeit(lambda: visa_pm.power, args.n))
+    report('tlpm power', timeit(lambda: tlpm_pm.power, args.n))
+    report('visa count', timeit(lambda: visa_pm.count, args.n))
+    report('tlpm count', timeit(lambda: tlpm_pm.count, args.n))
+
+    # interval 0: the stand-in returns at once, leaving only the conversion cost
+    tlpm = TLPM(FakeTLPM())
+    buffer = np.empty(10000)
+    report('ctypes sequence', timeit(lambda: ctypes_sequence(tlpm, 10000), 200))
+    report('numpy sequence', timeit(lambda: tlpm.powerSequence(10000, 0, buffer), 200))
+
+    for label, pm in [('single', tlpm_pm), ('burst', tlpm_pm)]:
+        pm.burst = label == 'burst'
+        pm.record_delay = 0
+        pm.recording = True
+        time.sleep(1)
+        pm.recording = False
+        time.sleep(0.1)
+        print(f'{label:>16}: {pm.buffer_stats[0]} samples recorded in 1 s')
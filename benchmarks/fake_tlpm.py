@@ -0,0 +1,117 @@
+"""
+Stand-in for the TLPM vendor library, for running the PM100 TLPM
+backend without the meter or Windows:
+
+    PM100(backend='tlpm', tlpm_dll=FakeTLPM(latency=1e-3))
+
+Exposes the TLPM_* entry points the backend uses with the same
+argument conventions (byref() outputs, ctypes arrays); every
+measurement waits `latency` seconds, or count * interval for sequences.
+"""
+import ctypes
+import random
+import time
+
+import numpy as np
+
+
+def _out(ref):
+    """The ctypes object behind a byref() argument."""
+    return getattr(ref, '_obj', ref)
+
+
+def _value(arg):
+    return getattr(arg, 'value', arg)
+
+
+class FakeTLPM:
+    def __init__(self, power=1e-3, noise=1e-6, latency=0.0):
+        self.power = power
+        self.noise = noise
+        self.latency = latency
+        self.avg_count = 1
+        self.wavelength = 635.0
+        self.autorange = 1
+        self.array_mode = 0
+        self.array_length = 10
+        self.calls = 0
+
+    def _sample(self):
+        return random.gauss(self.power, self.noise)
+
+    def _wait(self, seconds):
+        self.calls += 1
+        if seconds:
+            time.sleep(seconds)
+
+    def TLPM_init(self, resource, id_query, reset, session):
+        _out(session).value = 1
+        return 0
+
+    def TLPM_close(self, session):
+        return 0
+
+    def TLPM_errorMessage(self, session, code, msg):
+        ctypes.memmove(msg, b'Fake TLPM error\0', 16)
+        return 0
+
+    def TLPM_measPower(self, session, power):
+        self._wait(self.latency)
+        _out(power).value = self._sample()
+        return 0
+
+    def TLPM_measCurrent(self, session, current):
+        self._wait(self.latency)
+        _out(current).value = self._sample()
+        return 0
+
+    def TLPM_setAvgCnt(self, session, count):
+        self.avg_count = _value(count)
+        return 0
+
+    def TLPM_getAvgCnt(self, session, count):
+        _out(count).value = self.avg_count
+        return 0
+
+    def TLPM_setWavelength(self, session, wavelength):
+        self.wavelength = _value(wavelength)
+        return 0
+
+    def TLPM_getWavelength(self, session, attribute, wavelength):
+        _out(wavelength).value = self.wavelength
+        return 0
+
+    def TLPM_setPowerAutoRange(self, session, mode):
+        self.autorange = _value(mode)
+        return 0
+
+    def TLPM_getPowerAutorange(self, session, mode):
+        _out(mode).value = self.autorange
+        return 0
+
+    def _fill(self, values, n):
+        np.ctypeslib.as_array(values)[:n] = np.random.normal(self.power, self.noise, n)
+
+    def _sequence(self, count, interval, values):
+        n = _value(count)
+        self._wait(n * _value(interval) * 1e-6)
+        self._fill(values, n)
+        return 0
+
+    def TLPM_setArrMeasurement(self, session, enable):
+        self.array_mode = _value(enable)
+        return 0
+
+    def TLPM_getPowerArrayMeasurement(self, session, count, timestamps, values):
+        n = min(self.array_length if self.array_mode else 1, len(values))
+        self._wait(self.latency)
+        self._fill(values, n)
+        np.ctypeslib.as_array(timestamps)[:n] = np.arange(n)
+        _out(count).value = n
+        return 0
+
+    def TLPM_getPowerMeasurementSequence(self, session, count, interval, values):
+        return self._sequence(count, interval, values)
+
+    def TLPM_getCurrentMeasurementSequence(self, session, count, interval, values):
+        return self._sequence(count, interval, values)
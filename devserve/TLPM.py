@@ -1,10 +1,17 @@
 import os
 from ctypes import cdll,c_long,c_uint32,byref,create_string_buffer,c_bool,c_char_p,c_int,c_int16,c_double, sizeof, c_voidp
+import numpy as np
 
 class TLPM:
 
-	def __init__(self):
-		if sizeof(c_voidp) == 4:
+	def __init__(self, dll=None):
+		# dll: an already loaded library (or a stand-in) to use instead of
+		# TLPM_32.dll / TLPM_64.dll, or the path of one to load
+		if isinstance(dll, str):
+			self.dll = cdll.LoadLibrary(dll)
+		elif dll is not None:
+			self.dll = dll
+		elif sizeof(c_voidp) == 4:
 			self.dll = cdll.LoadLibrary("TLPM_32.dll")
 		else:
 			self.dll = cdll.LoadLibrary("TLPM_64.dll")
@@ -2910,6 +2917,51 @@ class TLPM:
 		self.__testForError(pInvokeResult)
 		return pInvokeResult
 
+	def _npBuffer(self, out, length, dtype):
+		if out is None:
+			return np.empty(length, dtype=dtype)
+		if out.dtype != dtype or not out.flags.c_contiguous or len(out) < length:
+			raise ValueError(f'out must be a contiguous {np.dtype(dtype).name} array of at least {length} elements')
+		return out
+
+	def powerArray(self, arrayLength, timestamps=None, powerValues=None):
+		"""
+		NumPy version of getPowerArrayMeasurement. The arrays are handed to the
+		driver directly, so no element is copied in Python; pass timestamps /
+		powerValues to reuse buffers between calls.
+
+		Args:
+			arrayLength(int) : Capacity of the result arrays.
+			timestamps(np.uint32 array, optional)
+			powerValues(np.float64 array, optional)
+		Returns:
+			(timestamps, powerValues): views of the first `count` elements.
+		"""
+		timestamps = self._npBuffer(timestamps, arrayLength, np.uint32)
+		powerValues = self._npBuffer(powerValues, arrayLength, np.float64)
+		count = c_uint32(arrayLength)
+		self.getPowerArrayMeasurement(byref(count), np.ctypeslib.as_ctypes(timestamps[:arrayLength]),
+									  np.ctypeslib.as_ctypes(powerValues[:arrayLength]))
+		return timestamps[:count.value], powerValues[:count.value]
+
+	def powerSequence(self, count, interval, out=None):
+		"""
+		NumPy version of getPowerMeasurementSequence; fills `out` (or a new
+		float64 array) in place and returns a view of `count` elements.
+		"""
+		out = self._npBuffer(out, count, np.float64)[:count]
+		self.getPowerMeasurementSequence(c_int(count), c_int(interval), np.ctypeslib.as_ctypes(out))
+		return out
+
+	def currentSequence(self, count, interval, out=None):
+		"""
+		NumPy version of getCurrentMeasurementSequence; fills `out` (or a new
+		float64 array) in place and returns a view of `count` elements.
+		"""
+		out = self._npBuffer(out, count, np.float64)[:count]
+		self.getCurrentMeasurementSequence(c_int(count), c_int(interval), np.ctypeslib.as_ctypes(out))
+		return out
+
 	def getPowerDensityMeasurementSequence(self, count, interval, powerDensityValues):
 		"""
 		This function filles the given array with measurements from the device.
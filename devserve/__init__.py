@@ -1,6 +1,12 @@
-__all__ = ["I will get rewritten"]
-# Don't modify the line above, or this line!
-import automodinit
-automodinit.automodinit(__name__, __file__, globals())
-del automodinit
-# Anything else you want can go after here, it won't get modified.
+import importlib
+
+__all__ = ["TLPM", "async_clients", "cache", "clients", "codec", "devices", "jobs",
+           "planner", "registry", "retry", "scheduler", "servers", "shadow", "stream"]
+
+
+def __getattr__(name):
+    # Submodules load on first use, so `import devserve.clients` does
+    # not pull in flask, redis and every hardware driver.
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__} has no attribute {name}')
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+
+from .clients import decode_array
+from .codec import Codec
+from .scheduler import DeadlineExpired
+
+PER_DEVICE_LIMIT = 4
+TOTAL_LIMIT = 100
+logger = logging.getLogger(__name__)
+
+
+class AsyncDeviceClient:
+    """
+    asyncio counterpart of DeviceClient.
+
+        wl = await dev.wl
+        await dev.set('wl', 250)
+        state = await dev.get_state(['gr', 'wl'])
+
+    At most `limit` requests to the device are in flight at once;
+    the rest wait on a semaphore instead of opening more connections.
+    """
+    def __init__(self, name, addr: str, system=None, limit=PER_DEVICE_LIMIT):
+        self._name = name
+        self._addr = addr
+        self._system = system
+        self._limit = asyncio.Semaphore(limit)
+        self._codec = None
+        self._priority = 'interactive'
+        self._deadline = None
+
+    async def _get_codec(self):
+        """Fetch the device schema once and compile its codec."""
+        if self._codec is None:
+            try:
+                _, schema = await self._request('GET', f'{self._addr}/_schema')
+            except AttributeError:
+                schema = None
+            self._codec = Codec(schema)
+        return self._codec
+
+    async def _request(self, method, url, **kwargs):
+        import aiohttp
+        session = await self._system._get_session()
+        headers = kwargs.setdefault('headers', {})
+        headers['X-Priority'] = self._priority
+        if self._deadline is not None:
+            headers['X-Deadline'] = str(self._deadline)
+        async with self._limit:
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    if resp.status == 404:
+                        raise AttributeError(f'{self._name}: {url} not found')
+                    if resp.status == 504:
+                        body = await resp.json(content_type=None)
+                        raise DeadlineExpired(body.get('message') or f'{self._name}: deadline expired')
+                    if resp.content_type == 'application/octet-stream':
+                        return resp.status, decode_array(await resp.read(), resp.headers)
+                    return resp.status, await resp.json(content_type=None)
+            except aiohttp.ClientError:
+                raise ConnectionError('Device address unavailable. Is the server running?')
+
+    async def get(self, attr):
+        status, body = await self._request('GET', f'{self._addr}/{attr}')
+        if status != 200:
+            raise AttributeError('Attribute {} is not available'.format(attr))
+        if not isinstance(body, dict):
+            return body
+        codec = await self._get_codec()
+        return codec.decode(attr, body.get('value', None))
+
+    async def set(self, attr, value):
+        state = await self.set_state({attr: value})
+        if attr not in state:
+            raise AttributeError('Attribute {} could not be set'.format(attr))
+        return state[attr]
+
+    async def get_state(self, attrs=None, fresh=False):
+        params = {} if attrs is None else {'attrs': ','.join(attrs)}
+        if fresh:
+            params['fresh'] = 'true'
+        _, body = await self._request('GET', f'{self._addr}/_batch', params=params)
+        for attr, err in body.get('errors', {}).items():
+            logger.warning(f'{self._name}.{attr} could not be read: {err}')
+        codec = await self._get_codec()
+        return {attr: codec.decode(attr, val) for attr, val in body.get('values', {}).items()}
+
+    async def set_state(self, state: dict):
+        _, body = await self._request('PUT', f'{self._addr}/_batch',
+                                      data=json.dumps({"values": state}),
+                                      headers={'Content-Type': 'application/json'})
+        for attr, err in body.get('errors', {}).items():
+            logger.warning(f'{self._name}.{attr} could not be set: {err}')
+        codec = await self._get_codec()
+        return {attr: codec.decode(attr, val) for attr, val in body.get('values', {}).items()}
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            return super().__getattribute__(item)
+        return self.get(item)
+
+
+class AsyncSystemClient:
+    """
+    asyncio counterpart of SystemClient, with the same device names.
+    All devices share one aiohttp session whose keep-alive pool holds
+    at most `total_limit` connections.
+
+        async with AsyncSystemClient.from_json_file(host, path) as s:
+            await s.gather(s.spfw.set('position', 2), s.lpfw.set('position', 3))
+    """
+    def __init__(self, addrs: dict, limit=PER_DEVICE_LIMIT, total_limit=TOTAL_LIMIT):
+        self.devices = {name: AsyncDeviceClient(name, addr, self, limit)
+                        for name, addr in addrs.items()}
+        self.total_limit = total_limit
+        self._session = None
+
+    @classmethod
+    def from_dict(cls, cfgs, host='localhost', **kwargs):
+        addrs = {cfg["name"]: f'http://{host}:{5000+i}/{cfg["name"]}'
+                 for i, cfg in enumerate(cfgs)}
+        return cls(addrs, **kwargs)
+
+    @classmethod
+    def from_json_file(cls, host, path: str, **kwargs):
+        with open(path, "r") as f:
+            cfgs = json.load(f)
+        return cls.from_dict(cfgs, host, **kwargs)
+
+    @classmethod
+    def from_registry(cls, registry=None, names=None, **kwargs):
+        from .registry import Registry
+        entries = (registry or Registry()).entries()
+        client = cls({name: entry["addr"] for name, entry in entries.items()
+                      if names is None or name in names}, **kwargs)
+        for name, device in client.devices.items():
+            device._codec = Codec(entries[name].get("schema"))
+        return client
+
+    @classmethod
+    def from_system(cls, system, **kwargs):
+        """Reuse the device addresses of a SystemClient."""
+        return cls({name: dev._addr for name, dev in system.devices.items()}, **kwargs)
+
+    def set_priority(self, lane, deadline=None):
+        for device in self.devices.values():
+            device._priority = lane
+            device._deadline = deadline
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.total_limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def gather(self, *aws, return_exceptions=False):
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    async def get_state(self, fetch=None, fresh=False):
+        if fetch is None:
+            fetch = {name: None for name in self.devices}
+        names = list(fetch)
+        results = await self.gather(*(self.devices[name].get_state(fetch[name], fresh) for name in names),
+                                    return_exceptions=True)
+        state = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.info(f'{name} generated an exception: {result}')
+            else:
+                state[name] = result
+        return state
+
+    async def set_state(self, states: dict):
+        names = list(states)
+        results = await self.gather(*(self.devices[name].set_state(states[name]) for name in names))
+        return dict(zip(names, results))
+
+    def __getattr__(self, item):
+        try:
+            return self.__dict__['devices'][item]
+        except KeyError:
+            raise AttributeError('System has no device {}'.format(item))
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __dir__(self):
+        return super().__dir__() + list(self.devices.keys())
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class AttributeCache:
+    """
+    Client-side copy of attribute values, each kept for its own TTL in
+    seconds. Attributes without a TTL (and no `default`) are never
+    cached. Writes go through the cache.
+    """
+    def __init__(self, ttls=None, default=None):
+        self.ttls = dict(ttls or {})
+        self.default = default
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, attr):
+        return self.ttls.get(attr, self.default)
+
+    def get(self, attr):
+        """(True, value) on a hit, (False, None) on a miss."""
+        ttl = self.ttl(attr)
+        if ttl is None:
+            # Never cached, so not a miss either
+            return False, None
+        with self._lock:
+            entry = self._values.get(attr)
+            if entry is not None and time.time() - entry[1] <= ttl:
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def put(self, attr, value):
+        if self.ttl(attr) is None:
+            return
+        with self._lock:
+            self._values[attr] = (value, time.time())
+
+    def written(self, attr, value, stale=()):
+        """Record a write: store the new value and drop the `stale` attributes."""
+        if attr == 'port':
+            self.invalidate()
+        for dep in stale:
+            self.invalidate(dep)
+        self.put(attr, value)
+
+    def invalidate(self, attr=None):
+        with self._lock:
+            if attr is None:
+                self._values.clear()
+            else:
+                self._values.pop(attr, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0,
+                    "cached": len(self._values)}
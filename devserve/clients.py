@@ -1,53 +1,356 @@
 import requests
-import ast
+import functools
 import json
 from typing import Dict
 import threading
 import time
 import socket
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from collections import defaultdict
-
-
-NTRIES = 3
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-s.connect(("8.8.8.8", 80))
-myip = s.getsockname()[0]
-s.close()
+from urllib.parse import urlsplit
+
+from .codec import Codec
+from .retry import READ_POLICY, WRITE_POLICY, CircuitBreaker
+from .scheduler import DeadlineExpired
+from .cache import AttributeCache
+from .planner import PlanError, execute, plan
+
+
+POOL_SIZE = 10
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def local_ip():
+    """Address of the interface that routes outside; loopback when offline."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+    finally:
+        s.close()
+
+
+def __getattr__(name):
+    # `myip` used to be computed at import time
+    if name == 'myip':
+        return local_ip()
+    raise AttributeError(f'module {__name__} has no attribute {name}')
+
+
+def decode_array(content, headers):
+    """Binary attributes arrive as raw bytes; view them as a numpy array."""
+    import numpy as np
+    shape = tuple(int(n) for n in headers['X-Shape'].split(',') if n)
+    return np.frombuffer(content, dtype=headers['X-Dtype']).reshape(shape)
+
+
+def make_session(pool_size=POOL_SIZE):
+    """
+    Keep-alive session whose connection pool is large enough
+    for the threads used by get_state_async/set_state_async.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class SessionPool:
+    """
+    One pooled session per host, shared by every client talking to it.
+    The urllib3 connection pool behind each session is thread-safe.
+    """
+    def __init__(self, pool_size=POOL_SIZE):
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, addr):
+        host = urlsplit(addr).netloc
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = make_session(self.pool_size)
+            return self._sessions[host]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class JobFuture(Future):
+    """
+    Future for a job started with DeviceClient.submit. A background
+    thread long-polls the server; the result is the dict of values
+    written. cancel() only succeeds while the job is still queued.
+    """
+    def __init__(self, client, job_id, poll=10):
+        super().__init__()
+        self.client = client
+        self.job_id = job_id
+        self.poll = poll
+        self._url = f'{client._addr}/_jobs/{job_id}'
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        while not self.done():
+            try:
+                resp = self.client._session.get(self._url, params={'wait': self.poll},
+                                                timeout=self.poll + 30)
+                job = resp.json()
+            except Exception as e:
+                if self.set_running_or_notify_cancel():
+                    self.set_exception(ConnectionError(f'Lost job {self.job_id}: {e}'))
+                return
+            status = job.get('status')
+            if status in ('queued', 'running'):
+                continue
+            if not self.set_running_or_notify_cancel():
+                return
+            if status == 'done':
+                result = job['result']
+                for attr, err in result.get('errors', {}).items():
+                    logger.warning(f'{self.client._name}.{attr} could not be set: {err}')
+                decode = self.client._get_codec().decode
+                values = {attr: decode(attr, val) for attr, val in result.get('values', {}).items()}
+                if self.client._cache is not None:
+                    read_back = result.get('readback', ())
+                    for attr, val in values.items():
+                        self.client._written(attr, val, attr in read_back)
+                self.set_result(values)
+            else:
+                self.set_exception(RuntimeError(f'{self.client._name} job {self.job_id} {status}: '
+                                                f'{job.get("error", "")}'))
+
+    def cancel(self):
+        if self.done():
+            return super().cancel()
+        try:
+            resp = self.client._session.delete(self._url, timeout=30)
+        except requests.RequestException:
+            return False
+        return resp.status_code == 200 and super().cancel()
+
+
+class Subscription:
+    """
+    Attribute updates pushed by the device servers over /_stream.
+    Devices behind the same server share one connection.
+
+        with s.subscribe({'pm': ['power'], 'spectro': ['wavelength']}, period=1) as sub:
+            for device, attr, value, t in sub:
+                ...
+    """
+    def __init__(self, devices, fetch, period=None, changes=False):
+        self._queue = queue.Queue()
+        self._responses = []
+        self._closed = False
+        servers = defaultdict(dict)
+        for name, attrs in fetch.items():
+            device = devices[name]
+            parts = urlsplit(device._addr)
+            remote = parts.path.rstrip('/').rsplit('/', 1)[-1]
+            servers[f'{parts.scheme}://{parts.netloc}'][remote] = (device, attrs)
+        for base, wanted in servers.items():
+            params = {'attrs': ','.join(f'{remote}.{attr}' for remote, (_, attrs) in wanted.items()
+                                        for attr in attrs)}
+            if period:
+                params['period'] = period
+            if changes:
+                params['changes'] = 'true'
+            threading.Thread(target=self._listen, args=(base, params, wanted), daemon=True).start()
+
+    def _listen(self, base, params, wanted):
+        session = make_session(1)
+        try:
+            resp = session.get(f'{base}/_stream', params=params, stream=True, timeout=(5, None))
+            if resp.status_code == 404:
+                raise ConnectionError(f'{base} does not support streaming')
+            if resp.status_code != 200:
+                raise ValueError(resp.json().get('message', resp.status_code))
+            self._responses.append(resp)
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                device, _ = wanted[event['device']]
+                value = device._get_codec().decode(event['attr'], event['value'])
+                self._queue.put((device._name, event['attr'], value, event['t']))
+        except Exception as e:
+            if not self._closed:
+                if isinstance(e, requests.RequestException):
+                    e = ConnectionError(f'Lost stream from {base}: {e}')
+                self._queue.put(e)
+        finally:
+            session.close()
+
+    def get(self, timeout=None):
+        """Next (device, attr, value, t); raises queue.Empty after `timeout` s."""
+        item = self._queue.get(timeout=timeout)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def __iter__(self):
+        while not self._closed:
+            yield self.get()
+
+    def close(self):
+        self._closed = True
+        for resp in self._responses:
+            resp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 class DeviceClient:
-    def __init__(self, name, addr: str):
+    def __init__(self, name, addr: str, session=None, policy=None, breaker=None):
         self._name = name
         self._addr = addr
+        self._session = session if session is not None else make_session()
+        self._batch = True
+        self._codec = None
+        # Server-side scheduling lane and per-request deadline (seconds)
+        self._priority = 'interactive'
+        self._deadline = None
+        self._policies = {'read': policy or READ_POLICY, 'write': WRITE_POLICY}
+        self._attr_policies = {} # (attribute, 'read'/'write') -> RetryPolicy
+        self._breaker = breaker or CircuitBreaker()
+        self._cache = None
+
+    @property
+    def _headers(self):
+        headers = {'X-Priority': self._priority}
+        if self._deadline is not None:
+            headers['X-Deadline'] = str(self._deadline)
+        return headers
+
+    def set_policy(self, policy, attrs=None, write=False):
+        """
+        Timeout and retries for reads (or writes) of `attrs`, or of every
+        attribute without its own policy when `attrs` is None.
+        """
+        kind = 'write' if write else 'read'
+        if attrs is None:
+            self._policies[kind] = policy
+        for attr in attrs or ():
+            self._attr_policies[(attr, kind)] = policy
+
+    def _policy(self, attrs, kind):
+        chosen = [self._attr_policies[(a, kind)] for a in attrs if (a, kind) in self._attr_policies]
+        # In a batch the slowest attribute sets the timeout
+        return max(chosen, key=lambda p: p.timeout) if chosen else self._policies[kind]
+
+    def _request(self, method, url, attrs=(), write=False, timeout=None, **kwargs):
+        """
+        One logical request under the attribute's RetryPolicy and the
+        device's CircuitBreaker. Connection errors, timeouts and 5xx
+        answers are retried with backoff. Returns the last response, or
+        raises ConnectionError once retries are exhausted.
+
+        A 504 means the server is up but the command missed its X-Deadline
+        in the device queue; it raises DeadlineExpired at once, since a
+        retry would queue it again, and does not count against the circuit.
+        """
+        policy = self._policy(attrs, 'write' if write else 'read')
+        self._breaker.allow()
+        kwargs.setdefault('headers', self._headers)
+        delays = policy.delays()
+        while True:
+            try:
+                resp = self._session.request(method, url, timeout=timeout or policy.timeout, **kwargs)
+                if resp.status_code == 504:
+                    self._breaker.success()
+                    try:
+                        message = resp.json().get('message')
+                    except ValueError:
+                        message = None
+                    raise DeadlineExpired(message or f'{self._name}: deadline expired before the command started')
+                if resp.status_code < 500:
+                    self._breaker.success()
+                    return resp
+                error = None
+            except requests.RequestException as e:
+                resp, error = None, e
+            delay = next(delays, None)
+            if delay is None:
+                self._breaker.failure()
+                if resp is not None:
+                    return resp
+                raise ConnectionError(f'Device address unavailable. Is the server running? ({error})')
+            self._breaker.retried()
+            time.sleep(delay)
+
+    @property
+    def _schema(self):
+        return self._get_codec().schema
+
+    def enable_cache(self, ttls=None, default=None):
+        """
+        Serve repeated reads from a local copy: `ttls` maps attribute ->
+        seconds, `default` applies to the rest (None: not cached).
+        The attribute list never changes and is cached for good.
+        """
+        ttls = dict(ttls or {})
+        ttls.setdefault('attributes', float('inf'))
+        self._cache = AttributeCache(ttls, default)
+
+    def _written(self, attr, value, read_back):
+        # The schema lists what a write makes stale on the server
+        self._cache.written(attr, value, self._schema.get(attr, {}).get('invalidates', ()))
+        if not read_back:
+            # An echo of the request says nothing about where the hardware is
+            self._cache.invalidate(attr)
+
+    def disable_cache(self):
+        self._cache = None
+
+    def refresh(self, attrs=None):
+        """Re-read `attrs` (default: all cached ones) from the hardware into the cache."""
+        if self._cache is None:
+            return self.get_state(attrs, fresh=True)
+        if attrs is None:
+            attrs = [a for a, spec in self._schema.items()
+                     if self._cache.ttl(a) is not None and spec.get('type') != 'array']
+        return self.get_state(attrs, fresh=True)
+
+    def cache_stats(self):
+        return self._cache.stats() if self._cache is not None else None
+
+    def _get_codec(self):
+        """Fetch the device schema once and compile its codec."""
+        if self._codec is None:
+            resp = self._request('GET', f'{self._addr}/_schema')
+            # Servers without a schema endpoint get the old literal_eval guessing
+            self._codec = Codec(resp.json() if resp.status_code == 200 else None)
+        return self._codec
 
     def __getattr__(self, item):
         if item.startswith('_'):
             return super().__getattribute__(item)
-        try:
-            for _ in range(NTRIES):
-                try:
-                    resp = requests.get('{addr}/{item}'.format(addr=self._addr, item=item), timeout=30)
-                    if resp.status_code is 200:
-                        break
-
-                    time.sleep(0.1)
-                except:
-                    pass
-            if resp.status_code is 200:
-                val = None
-                try:
-                    val = resp.json().get('value', None)
-                except:
-                    pass
-                try:
-                    val = ast.literal_eval(resp.json().get('value', None))
-                except:
-                    pass
-                return val
-        except:
-            raise ConnectionError('Device address unavailable. Is the server running?')
+        if self._cache is not None:
+            hit, value = self._cache.get(item)
+            if hit:
+                return value
+        resp = self._request('GET', '{addr}/{item}'.format(addr=self._addr, item=item), (item,))
+        if resp.status_code == 200:
+            if resp.headers.get('Content-Type', '').startswith('application/octet-stream'):
+                return decode_array(resp.content, resp.headers)
+            value = self._get_codec().decode(item, resp.json().get('value', None))
+            if self._cache is not None:
+                self._cache.put(item, value)
+            return value
         raise AttributeError('Attribute {} is not available'.format( item))
 
     def __setitem__(self, key, value):
@@ -60,45 +363,202 @@ class DeviceClient:
         if key.startswith('_'):
             super().__setattr__(key, value)
         else:
-            try:
-                resp = requests.put('{addr}/{key}'.format(addr=self._addr, key=key), data={"value": value}, timeout=300)
-                if resp.status_code is 201:
-                    val = None
-                    try:
-                        val = resp.json().get('value', None)
-                    except:
-                        pass
-                    try:
-                        val = ast.literal_eval(resp.json().get('value', None))
-                    except:
-                        pass
-                    return val
-                else:
-                    val = getattr(self, key)
-                    return val
-                    # raise 'Bad response from server code: {}'.format(resp.status_code)
-            except:
-                raise ConnectionError('Device address unavailable. Is the server running?')
+            codec = self._get_codec()
+            value = codec.encode(key, value)
+            resp = self._request('PUT', '{addr}/{key}'.format(addr=self._addr, key=key), (key,),
+                                 write=True, data={"value": value})
+            if resp.status_code == 201:
+                body = resp.json()
+                value = codec.decode(key, body.get('value', None))
+                if self._cache is not None:
+                    self._written(key, value, body.get('readback', False))
+                return value
+            else:
+                if self._cache is not None:
+                    self._cache.invalidate(key)
+                val = getattr(self, key)
+                return val
+                # raise 'Bad response from server code: {}'.format(resp.status_code)
 
     def __dir__(self):
-        return super().__dir__() + self.attributes
+        return super().__dir__() + (list(self._schema) or self.attributes)
+
+    def read(self, attr, fresh=False):
+        """
+        Returns (value, age). Servers may answer from their shadow copy;
+        `fresh=True` forces a hardware read.
+        """
+        resp = self._request('GET', f'{self._addr}/{attr}', (attr,), params={'fresh': str(fresh).lower()})
+        if resp.status_code != 200:
+            raise AttributeError('Attribute {} is not available'.format(attr))
+        body = resp.json()
+        value = self._get_codec().decode(attr, body.get('value', None))
+        if self._cache is not None:
+            self._cache.put(attr, value)
+        return value, body.get('age', 0.0)
+
+    def health(self, timeout=1.0):
+        """
+        One bounded round trip: {"status", "connected", "rtt", "call_latency",
+        "queue_wait", "error"}. status is 'ok', 'disconnected', 'timeout'
+        or 'unreachable'. call_latency is the median of the device's recent
+        hardware calls. Times are in seconds.
+        """
+        report = {"status": "unreachable", "connected": False, "rtt": None,
+                  "call_latency": None, "queue_wait": None, "error": None}
+        headers = dict(self._headers, **{'X-Deadline': str(timeout)})
+        t0 = time.time()
+        try:
+            resp = self._session.get(f'{self._addr}/_health', headers=headers, timeout=timeout)
+            if resp.status_code == 404:
+                # Server without /_health
+                resp = self._session.get(f'{self._addr}/connected', headers=headers, timeout=timeout)
+                body = {"connected": self._get_codec().decode('connected', resp.json().get('value'))}
+            else:
+                body = resp.json()
+        except requests.Timeout:
+            report.update(status="timeout", error=f'No answer within {timeout} s')
+            return report
+        except requests.ConnectionError:
+            report["error"] = 'Server not reachable'
+            return report
+        except (requests.RequestException, ValueError) as e:
+            report["error"] = repr(e)
+            return report
+        report["rtt"] = time.time() - t0
+        for key in ("connected", "call_latency", "queue_wait", "error"):
+            report[key] = body.get(key, report[key])
+        if resp.status_code == 504:
+            report["status"] = "timeout"
+        else:
+            report["status"] = "ok" if report["connected"] else "disconnected"
+        if report["status"] == "ok":
+            # The server answers again; close the circuit without waiting
+            self._breaker.reset()
+        return report
+
+    def reconnect(self, timeout=5.0):
+        """Re-open the hardware connection by writing its port back. Returns True on success."""
+        try:
+            port = self._get_batch(['port'], timeout=timeout)
+            if not port:
+                return False
+            self._put_batch(port, timeout=timeout)
+        except (ConnectionError, requests.RequestException, ValueError):
+            return False
+        return self.health(timeout)["connected"]
+
+    def _get_batch(self, attrs=None, fresh=False, timeout=None):
+        params = {} if attrs is None else {'attrs': ','.join(attrs)}
+        if fresh:
+            params['fresh'] = 'true'
+        resp = self._request('GET', f'{self._addr}/_batch', attrs or (), timeout=timeout, params=params)
+        if resp.status_code == 404:
+            # Server predates the batch endpoint
+            self._batch = False
+            return None
+        body = resp.json()
+        for attr, err in body.get('errors', {}).items():
+            logger.warning(f'{self._name}.{attr} could not be read: {err}')
+        decode = self._get_codec().decode
+        return {attr: decode(attr, val) for attr, val in body.get('values', {}).items()}
+
+    def _put_batch(self, state: dict, timeout=None):
+        resp = self._request('PUT', f'{self._addr}/_batch', state, write=True, timeout=timeout,
+                             json={"values": state})
+        if resp.status_code == 404:
+            self._batch = False
+            return None
+        body = resp.json()
+        for attr, err in body.get('errors', {}).items():
+            logger.warning(f'{self._name}.{attr} could not be set: {err}')
+        decode = self._get_codec().decode
+        values = {attr: decode(attr, val) for attr, val in body.get('values', {}).items()}
+        if self._cache is not None:
+            for attr in body.get('errors', {}):
+                self._cache.invalidate(attr)
+            read_back = body.get('readback', ())
+            for attr, val in values.items():
+                self._written(attr, val, attr in read_back)
+        return values
+
+    def submit(self, state: dict):
+        """
+        Start writing `state` and return at once with a JobFuture, e.g.
+            exposure = s.spectro.submit({'running': True})
+            s.lpfw.position = 3
+            exposure.result()
+        """
+        if self._cache is not None:
+            for attr in state:
+                self._cache.invalidate(attr)
+        # Only queues the job, so the write timeout does not apply
+        resp = self._request('POST', f'{self._addr}/_jobs', write=True, timeout=30,
+                             json={"values": state})
+        if resp.status_code != 202:
+            raise RuntimeError(f'{self._name} did not accept the job (HTTP {resp.status_code})')
+        return JobFuture(self, resp.json()['id'])
+
+    def call(self, method, timeout=None, **kwargs):
+        """
+        Run one of the device's `calls` with keyword arguments and return
+        its result, e.g. s.power_meter_b.call('read_adaptive', precision=1e-3).
+        Tried once, like a write.
+        """
+        resp = self._request('POST', f'{self._addr}/_calls/{method}', (method,), write=True,
+                             timeout=timeout, json={"kwargs": kwargs})
+        if resp.status_code != 200:
+            try:
+                message = resp.json().get('message')
+            except ValueError:
+                message = None
+            raise RuntimeError(f'{self._name}.{method} failed (HTTP {resp.status_code}): {message}')
+        return resp.json()['value']
 
     def set_state(self, state: dict):
+        if self._batch and self._put_batch(state) is not None:
+            return
         attrs = self.attributes
         for attr in attrs:
             if attr in state:
                 setattr(self, attr, state[attr])
 
-    def get_state(self, attrs=None):
+    def get_state(self, attrs=None, fresh=False):
+        cached = {}
+        if self._cache is not None and not fresh:
+            missing = []
+            for attr in (self.attributes if attrs is None else attrs):
+                hit, value = self._cache.get(attr)
+                if hit:
+                    cached[attr] = value
+                else:
+                    missing.append(attr)
+            if not missing:
+                return cached
+            attrs = missing
+        state = self._fetch_state(attrs, fresh)
+        if self._cache is not None:
+            for attr, value in state.items():
+                self._cache.put(attr, value)
+        return dict(cached, **state)
+
+    def _fetch_state(self, attrs, fresh):
+        if self._batch:
+            state = self._get_batch(attrs, fresh)
+            if state is not None:
+                return state
         if attrs is None:
             attrs = self.attributes
-       
+
         state = {attr: getattr(self, attr) for attr in attrs}
         return state
+
+
 class RecordingDeviceClient(DeviceClient):
     
-    def __init__(self, name, addr: str):
-        super().__init__(name, addr)
+    def __init__(self, name, addr: str, session=None):
+        super().__init__(name, addr, session)
+        self._priority = 'background'
         self._record_mode = 'None'
         self.__recording = set()
         self._record_delay = 10
@@ -125,33 +585,45 @@ class RecordingDeviceClient(DeviceClient):
         if value in self.__recording:
             self.__recording.remove(value)
 
+    def _record(self, influx, attr, value):
+        if self._record_mode == 'influx':
+            data = {
+                "measurement": attr,
+                "fields":{
+                    "name": attr,
+                    "device": self._name,
+                    "value": value
+                }
+            }
+            influx.write_points([data], database="recordings")
+
+        elif self._record_mode == 'mongo':
+            pass
+
+        elif self._record_mode == 'file':
+            pass
+
     def recorder(self):
         from influxdb import InfluxDBClient
         influx = InfluxDBClient(host='localhost', port=8086)
         dbs = influx.get_list_database()
         if "recordings" not in [d['name'] for d in dbs]:
             influx.create_database("recordings")
-        while True:
-            if not len(self.__recording):
-                break
-            for attr in self.__recording:
-                if self._record_mode is 'influx':
-                    data = {
-                        "measurement": attr,
-                        "fields":{
-                            "name": attr,
-                            "device": self._name,
-                            "value": getattr(self, attr)
-                        }
-                    }
-                    influx.write_points([data], database="recordings")
-
-                elif self._record_mode is 'mongo':
-                    pass
-
-                elif self._record_mode is 'file':
-                    pass
-            time.sleep(self._record_delay)
+        while len(self.__recording):
+            attrs = set(self.__recording)
+            try:
+                # One streaming request instead of a GET per attribute per sample
+                with Subscription({self._name: self}, {self._name: sorted(attrs)},
+                                  period=self._record_delay) as sub:
+                    for _, attr, value, _ in sub:
+                        self._record(influx, attr, value)
+                        if self.__recording != attrs:
+                            break
+            except ConnectionError:
+                # Server without /_stream
+                for attr in attrs:
+                    self._record(influx, attr, getattr(self, attr))
+                time.sleep(self._record_delay)
 
 ClientDict = Dict[str, DeviceClient]
 
@@ -163,27 +635,48 @@ ClientDict = Dict[str, DeviceClient]
 
 class SystemClient:
 
-    def __init__(self, devices: ClientDict):
+    def __init__(self, devices: ClientDict, pool_size=POOL_SIZE):
         self.devices = devices
+        self.sessions = SessionPool(pool_size)
+        for device in self.devices.values():
+            device._session = self.sessions.get(device._addr)
         # if "experiment" not in self.devices:
         #     self.devices['experiment'] = GlobalStorage()
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
-    def validate_device_connections(self):
-        for device_name, device in self.devices.items():
-            print(f"Checking {device_name}... ", end="", flush=True)
-            try:
-                if not device.connected:
-                    # Try to reconnect again
-                    device.port = device.port
-                    time.sleep(0.5)
-            except ConnectionError:
-                print(f"Device {device_name} does not respond. Check the connection.")
-                raise
-            finally:
-                print("OK" if device.connected else "FAIL")
-
+    def validate_device_connections(self, timeout=1.0, reconnect=True, reconnect_timeout=5.0,
+                                    verbose=True):
+        """
+        Checks every device at once and returns {name: report} as from
+        DeviceClient.health, plus "reconnected" (None if not attempted).
+        Disconnected devices get one reconnect attempt.
+        """
+        def check(device):
+            report = device.health(timeout)
+            report["reconnected"] = None
+            if reconnect and report["status"] == "disconnected":
+                report["reconnected"] = device.reconnect(reconnect_timeout)
+                if report["reconnected"]:
+                    report["status"] = "ok"
+            return report
+
+        with ThreadPoolExecutor(max(len(self.devices), 1)) as pool:
+            futures = {name: pool.submit(check, device) for name, device in self.devices.items()}
+            report = {name: future.result() for name, future in futures.items()}
+
+        if verbose:
+            for name, r in report.items():
+                ok = r["status"] == "ok"
+                rtt = f'{1000 * r["rtt"]:6.1f} ms' if r["rtt"] is not None else '    -    '
+                call = f'{1000 * r["call_latency"]:6.1f} ms' if r["call_latency"] is not None else '    -    '
+                note = {True: ' (reconnected)', False: ' (reconnect failed)'}.get(r["reconnected"], '')
+                if r["error"]:
+                    note += f' {r["error"]}'
+
+                print(f"  {'OK  ' if ok else '!!!FAIL!!!'} {name:<16} {r['status']:<12} "
+                      f"rtt {rtt}  hw {call}{note}")
+        return report
 
     @classmethod
     def from_json_file(cls, host ,path: str):
@@ -203,12 +696,30 @@ class SystemClient:
         config.read(path)
         clients = {}
         for idx, name in enumerate(config.sections()):
-            cfg = {k:v.format(idx=idx, myip=myip) for k,v in config[name].items()}
+            cfg = {k:v.format(idx=idx, myip=local_ip()) for k,v in config[name].items()}
             addr = f'http://{cfg["host"]}:{cfg["port"]}/{name}'
             c = DeviceClient(name, addr)
             clients[name] = c
         return cls(clients)
 
+    @classmethod
+    def from_registry(cls, registry=None, names=None):
+        """
+        Clients for the live, connected devices published in a local
+        Registry, optionally only those in `names`. Schemas come with
+        the registry entries, so no request is made here.
+        """
+        from .registry import Registry
+        registry = registry or Registry()
+        clients = {}
+        for name, entry in registry.entries().items():
+            if names is not None and name not in names:
+                continue
+            c = DeviceClient(name, entry["addr"])
+            c._codec = Codec(entry.get("schema"))
+            clients[name] = c
+        return cls(clients)
+
     @classmethod
     def from_dict(cls, cfgs: str, host='localhost'):
         clients = {}
@@ -218,6 +729,48 @@ class SystemClient:
             clients[cfg["name"]] = c
         return cls(clients)
 
+    def subscribe(self, fetch, period=None, changes=False):
+        """
+        Stream updates of {name: [attrs]} instead of polling them.
+        `period` (s) asks the servers to sample at that rate; `changes`
+        only delivers values that differ from the previous one.
+        """
+        return Subscription(self.devices, fetch, period, changes)
+
+    def set_policy(self, policy, attrs=None, write=False):
+        """Retry policy for every device; see DeviceClient.set_policy."""
+        for device in self.devices.values():
+            device.set_policy(policy, attrs, write)
+
+    def enable_cache(self, ttls=None, default=None):
+        """
+        Opt-in client cache on every device. `ttls` maps device name ->
+        {attribute: seconds}; `default` applies to all other attributes.
+        """
+        for name, device in self.devices.items():
+            device.enable_cache((ttls or {}).get(name), default)
+
+    def refresh(self, fetch=None):
+        """Re-read cached attributes from the hardware; `fetch` as in get_state."""
+        fetch = fetch or {name: None for name in self.devices}
+        return {name: self.devices[name].refresh(attrs) for name, attrs in fetch.items()}
+
+    def cache_stats(self):
+        return {name: device.cache_stats() for name, device in self.devices.items()}
+
+    def circuit_stats(self):
+        """{name: circuit breaker state and counters} for monitoring."""
+        return {name: device._breaker.stats() for name, device in self.devices.items()}
+
+    def set_priority(self, lane, deadline=None):
+        """
+        Scheduling lane ('interactive', 'scan' or 'background') and
+        optional deadline in seconds for every following request.
+        """
+        for device in self.devices.values():
+            device._priority = lane
+            device._deadline = deadline
+
     def set_state_async(self, states: dict):
         ts = []
         for name, state in states.items():
@@ -229,30 +782,104 @@ class SystemClient:
         for t in ts:
             t.join()
 
+    def submit(self, states: dict):
+        """Start a job on every device in `states`; returns {name: JobFuture}."""
+        return {name: self.devices[name].submit(state) for name, state in states.items()}
+
     def set_state(self, states: dict):
         for name, state in states.items():
             dev = self.devices.get(name)
             dev.set_state(state)
   
 
-    def get_state(self, fetch=None):
+    def apply_state(self, target: dict, stages=None, force=False, dry_run=False):
+        """
+        Move the system to `target` ({name: {attr: value}}).
+
+        The current values are read first (from the client cache where
+        enabled) and writes that would change nothing are dropped, unless
+        `force`. The rest run per `stages` (see planner.plan): e.g.
+        stages=[['source_shutter.on', 'spectro.shutter']] closes the
+        shutters before anything else moves; devices in a stage move
+        concurrently. Returns a report with the skipped writes and the
+        per-device, per-stage and critical-path timings.
+        """
+        t0 = time.time()
+        current = {} if force else self.get_state_async({name: list(state) for name, state in target.items()})
+        steps, skipped = plan(target, current, stages)
+        extra = {"skipped": skipped, "read": time.time() - t0}
+        if dry_run:
+            return dict(extra, stages=[{"writes": step} for step in steps])
+        try:
+            report = execute(self.devices, steps)
+        except PlanError as e:
+            e.report.update(extra)
+            raise
+        return dict(report, **extra)
+
+    def read_paired(self, names=('power_meter_a', 'power_meter_b'), attr='power', count=None, repeats=1):
+        """
+        Read `attr` from all `names` at the same moment, `repeats` times.
+        The reads of each round are released together and run concurrently,
+        so the round costs the slowest device rather than the sum. `count`
+        sets each device's averaging count first (skipped if unchanged).
+
+        Returns one record: {name: mean value}, "samples" {name: [values]},
+        "ratio" (mean over rounds of names[1] / names[0]), "t" (mean read
+        midpoint), "skew" (largest midpoint spread in a round, s) and
+        "duration".
+        """
+        names = list(names)
+        if count is not None:
+            self.apply_state({name: {'count': count} for name in names})
+        barrier = threading.Barrier(len(names))
+
+        def timed_read(name):
+            barrier.wait()
+            t0 = time.time()
+            value, _ = self.devices[name].read(attr, fresh=True)
+            return value, (t0 + time.time()) / 2
+
+        samples = {name: [] for name in names}
+        mids, skews, ratios = [], [], []
+        t_start = time.time()
+        with ThreadPoolExecutor(len(names)) as pool:
+            for _ in range(repeats):
+                futures = {name: pool.submit(timed_read, name) for name in names}
+                results = {name: future.result() for name, future in futures.items()}
+                for name, (value, _) in results.items():
+                    samples[name].append(value)
+                round_mids = [mid for _, mid in results.values()]
+                mids.append(sum(round_mids) / len(round_mids))
+                skews.append(max(round_mids) - min(round_mids))
+                if len(names) > 1:
+                    a, b = results[names[0]][0], results[names[1]][0]
+                    ratios.append(b / a if a else float('nan'))
+
+        record = {name: sum(values) / len(values) for name, values in samples.items()}
+        record.update(samples=samples, t=sum(mids) / len(mids), skew=max(skews),
+                      ratio=sum(ratios) / len(ratios) if ratios else None,
+                      duration=time.time() - t_start)
+        return record
+
+    def get_state(self, fetch=None, fresh=False):
         if fetch is None:
-            fetch = {name: dev.attributes for name, dev in self.devices.items()}
+            fetch = {name: None for name in self.devices}
         state = {}
         for name, attrs in fetch.items():
             device = self.devices[name]
-            state[name] = device.get_state(attrs)
+            state[name] = device.get_state(attrs, fresh)
         return state
 
-    def get_state_async(self, fetch=None):
+    def get_state_async(self, fetch=None, fresh=False):
         if fetch is None:
-            fetch = {name: dev.attributes for name, dev in self.devices.items()}
+            fetch = {name: None for name in self.devices}
 
         with ThreadPoolExecutor(10) as pool:
             futures_to_name = {}
             for name, attrs in fetch.items():
                 device = self.devices[name]
-                futures = {pool.submit(device.get_state, attrs): name}
+                futures = {pool.submit(device.get_state, attrs, fresh): name}
                 futures_to_name.update(futures)
 
             state = defaultdict(dict)
@@ -266,6 +893,15 @@ class SystemClient:
                     state[name] = result
         return dict(state)
 
+    def close(self):
+        self.sessions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def __getattr__(self, item):
         try:
             return self.devices.get(item)
@@ -277,3 +913,52 @@ class SystemClient:
 
     def __dir__(self):
         return super().__dir__() + list(self.devices.keys())
+
+
+class LazySystemClient:
+    """
+    Stands in for a SystemClient that is only built on first use, so
+    modules can define a client at import time without reading config
+    files or touching the network.
+
+        s = LazySystemClient.from_json_file("localhost", path)
+    """
+    def __init__(self, factory, *args, **kwargs):
+        self._factory = functools.partial(factory, *args, **kwargs)
+        self._system = None
+        self._setup = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json_file(cls, host, path: str):
+        return cls(SystemClient.from_json_file, host, path)
+
+    @classmethod
+    def from_config_file(cls, path: str):
+        return cls(SystemClient.from_config_file, path)
+
+    @classmethod
+    def from_registry(cls, registry=None, names=None):
+        return cls(SystemClient.from_registry, registry, names)
+
+    def configure(self, fn):
+        """Run fn(system) once the SystemClient is built, e.g. to enable its cache."""
+        self._setup.append(fn)
+
+    def _get(self):
+        with self._lock:
+            if self._system is None:
+                system = self._factory()
+                for fn in self._setup:
+                    fn(system)
+                self._system = system
+            return self._system
+
+    def __getattr__(self, item):
+        return getattr(self._get(), item)
+
+    def __getitem__(self, key):
+        return self._get()[key]
+
+    def __dir__(self):
+        return dir(self._get())
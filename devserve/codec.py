@@ -0,0 +1,78 @@
+import ast
+
+
+def decode_value(value):
+    """Servers may return stringified literals, e.g. '6' for a filter position."""
+    try:
+        return ast.literal_eval(value)
+    except:
+        return value
+
+
+def encode_value(value):
+    """Form values are strings; repr keeps lists/dicts literal_eval-able."""
+    return value if isinstance(value, str) else repr(value)
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ('1', 'true', 'on', 'yes'):
+            return True
+        if value in ('0', 'false', 'off', 'no'):
+            return False
+        raise ValueError(f'Not a boolean: {value}')
+    return bool(value)
+
+
+def _to_int(value):
+    if isinstance(value, str):
+        return int(float(value))
+    return int(value)
+
+
+# Attribute type -> (decode, encode). Decoders turn wire values
+# into python values on either end, encoders make form strings.
+TYPES = {
+    'float': (float,        lambda v: repr(float(v))),
+    'int':   (_to_int,      lambda v: str(_to_int(v))),
+    'bool':  (_to_bool,     lambda v: str(_to_bool(v))),
+    'str':   (str,          str),
+    'json':  (decode_value, encode_value),
+}
+
+
+def _safe(decode):
+    def wrapped(value):
+        if value is None:
+            return None
+        try:
+            return decode(value)
+        except (ValueError, TypeError):
+            return decode_value(value)
+    return wrapped
+
+
+class Codec:
+    """
+    Encoders and decoders for one device, compiled once from its schema
+    (attribute -> {"type", "access", "unit"}). Attributes missing from
+    the schema fall back to literal_eval guessing.
+    """
+    def __init__(self, schema=None):
+        self.schema = schema or {}
+        self.decoders = {}
+        self.encoders = {}
+        for attr, spec in self.schema.items():
+            decode, encode = TYPES.get(spec.get('type'), TYPES['json'])
+            self.decoders[attr] = _safe(decode)
+            self.encoders[attr] = encode
+
+    def decode(self, attr, value):
+        return self.decoders.get(attr, decode_value)(value)
+
+    def encode(self, attr, value):
+        return self.encoders.get(attr, encode_value)(value)
+
+    def writable(self, attr):
+        return 'w' in self.schema.get(attr, {}).get('access', 'rw')
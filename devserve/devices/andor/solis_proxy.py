@@ -1,9 +1,24 @@
 import serial
 import struct
 import time
-from ..device import Device
+import os
+import tempfile
+import numpy as np
+from ..device import Device, Attr
+from ..transport import SerialTransport
 import ast
 
+DONE = b"Done\r\n"
+# Grating polls start fast and back off, since moves take from under a
+# second to tens of seconds
+GRATING_POLL = 0.25
+GRATING_POLL_MAX = 4.0
+GRATING_BACKOFF = 1.5
+# Solis may still be writing a spectrum file it has created; it counts
+# as written once its size holds for this long
+SAVE_SETTLE = 0.1
+SAVE_TIMEOUT = 10
+
 class SolisProxy(Device):
     """
     Connects to a proxy script running in
@@ -18,7 +33,40 @@ class SolisProxy(Device):
                 'wavelength',      'min_wl',         'max_wl', # .
                  'save_path', 'carea_wlmin',    'carea_wlmax', # Data management
                    'running',       'saved', 'corrected_area', # Operations
-              'clear_screen']                                  # .
+              'clear_screen', 'spectrum_header', 'timings',    # .
+                  'io_stats']                                  # Diagnostics
+
+    binary = ['spectrum'] # Last acquisition as [wavelength, counts]
+
+    schema = {
+        'pixel_wl':        Attr('float', 'r',  'nm'),
+        'npixel_h':        Attr('int',   'r'),
+        'npixel_v':        Attr('int',   'r'),
+        'port':            Attr('str',   'rw'),
+        'baud':            Attr('int',   'rw', 'baud'),
+        'grating':         Attr('int',   'rw'),
+        'shutter':         Attr('json',  'rw'),
+        'exposure':        Attr('float', 'rw', 's'),
+        'slit_width':      Attr('float', 'rw', 'um'),
+        'wavelength':      Attr('float', 'rw', 'nm'),
+        'min_wl':          Attr('float', 'r',  'nm'),
+        'max_wl':          Attr('float', 'r',  'nm'),
+        'save_path':       Attr('str',   'rw'),
+        'carea_wlmin':     Attr('json',  'rw', 'nm'),
+        'carea_wlmax':     Attr('json',  'rw', 'nm'),
+        'running':         Attr('bool',  'rw'),
+        'saved':           Attr('bool',  'rw'),
+        'corrected_area':  Attr('float', 'r',  'counts'),
+        'clear_screen':    Attr('json',  'rw'),
+        'spectrum_header': Attr('str',   'r'),
+        'timings':         Attr('json',  'r',  's'),
+        'io_stats':        Attr('json',  'r'),
+        'spectrum':        Attr('array', 'r',  'nm, counts'),
+    }
+
+    shadow = {'wavelength': 30, 'min_wl': 30, 'max_wl': 30, 'grating': 30}
+    invalidates = {'wavelength': ['min_wl', 'max_wl'],
+                   'grating': ['wavelength', 'min_wl', 'max_wl']}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -28,6 +76,10 @@ class SolisProxy(Device):
         self._saved = False
         self._running = False
         self.conn = None
+        self.io = None
+        self._spectrum = None
+        self._spectrum_header = ''
+        self._scratch = os.path.join(tempfile.gettempdir(), f"solis_spectrum_{os.getpid()}.asc")
 
         self._pixel_wl =    0.523955
         self._npixel_h = 1600
@@ -35,6 +87,35 @@ class SolisProxy(Device):
 
         self._carea_range = [-1, -1] # Must be mutable!
 
+        # Overall deadlines (s) for an acquisition and a grating change
+        self._run_timeout = kwargs.get('run_timeout', 3600)
+        self._grating_timeout = kwargs.get('grating_timeout', 120)
+        self._timings = {}
+
+    @property
+    def timings(self):
+        """
+        Last 'running' and 'grating' operation: seconds blocked, the most
+        it can have lagged behind the hardware finishing, and polls made.
+        """
+        return self._timings
+
+    def _record(self, op, t0, lag, polls):
+        self._timings[op] = {"elapsed": time.time() - t0, "lag": lag, "polls": polls}
+
+    def wait_done(self, timeout):
+        """Returns as soon as the proxy prints Done; TimeoutError after `timeout` s."""
+        deadline = time.time() + timeout
+        buf = b''
+        reads = 0
+        while DONE not in buf:
+            if time.time() > deadline:
+                raise TimeoutError(f'Solis did not finish within {timeout} s')
+            # Returns on the terminator, or after the port timeout with whatever arrived
+            buf = buf[-len(DONE):] + self.conn.read_until(DONE)
+            reads += 1
+        return reads
+
     @property
     def pixel_wl(self):
         return self._pixel_wl
@@ -82,18 +163,16 @@ class SolisProxy(Device):
         self.connect()
 
     def query(self, q):
-        self.conn.write(f'{q}\r'.encode())
-        resp = self.conn.read(150)
-        resp = resp.strip().decode()
-        return resp
+        return self.io.query(q)
 
     def command(self, cmd, *args):
-        self.conn.write(f'{cmd}\r'.encode())
-        time.sleep(0.01)
-        self.conn.read(150)
+        self.io.request(cmd)
         for arg in args:
-            self.conn.write(f'{arg}\r'.encode())
-            self.conn.read(150)
+            self.io.request(arg)
+
+    @property
+    def io_stats(self):
+        return self.io.stats() if self.io is not None else {}
 
     @property
     def save_path(self):
@@ -133,6 +212,62 @@ class SolisProxy(Device):
         else:
             raise ValueError(f"Unrecognized save value {value}")
 
+    def _fetch_spectrum(self):
+        """
+        Has Solis save the last acquisition to a local scratch file and
+        parses it once it is completely written, so clients get the data
+        without a file of their own.
+        """
+        if os.path.exists(self._scratch):
+            os.remove(self._scratch)
+        self.command("Save", self._scratch)
+        deadline = time.time() + SAVE_TIMEOUT
+        size, t_size = -1, time.time()
+        while True:
+            try:
+                now = os.path.getsize(self._scratch)
+            except OSError:
+                now = -1
+            if now != size:
+                size, t_size = now, time.time()
+            elif size > 0 and time.time() - t_size >= SAVE_SETTLE:
+                break
+            if time.time() > deadline:
+                raise TimeoutError("Solis did not finish writing the spectrum")
+            time.sleep(0.01)
+
+        with open(self._scratch, 'r') as f:
+            lines = f.readlines()
+        os.remove(self._scratch)
+        while lines and not lines[-1].strip():
+            lines.pop()
+
+        # The numeric block starts after the last non-numeric (header) line
+        nheader = 0
+        for i, line in enumerate(lines):
+            try:
+                [float(x) for x in line.split()[:2]]
+                if len(line.split()) < 2:
+                    raise ValueError
+            except ValueError:
+                nheader = i + 1
+        self._spectrum_header = ''.join(lines[:nheader])
+        data = np.loadtxt(lines[nheader:], ndmin=2)
+        if len(data) < self._npixel_h:
+            raise IOError(f"Spectrum file has {len(data)} rows, expected {self._npixel_h}")
+        self._spectrum = np.ascontiguousarray(data[:, :2].T, dtype='<f4')
+
+    @property
+    def spectrum(self):
+        if self._spectrum is None:
+            self._fetch_spectrum()
+        return self._spectrum
+
+    @property
+    def spectrum_header(self):
+        """Solis header of the spectrum last served by `spectrum`."""
+        return self._spectrum_header
+
     @property
     def shutter(self):
         return self.query("GetShutter")
@@ -157,17 +292,14 @@ class SolisProxy(Device):
         if running not in [1, True, 'True']:
             raise ValueError(f"Unrecognized running status {running}")
 
-        self.command('Run')
-        while True:
-            try:
-                if self.conn.read(150) == b"Done\r\n":
-                    break
-            except:
-                pass
-
-            time.sleep(0.2)
+        t0 = time.time()
+        self.conn.reset_input_buffer()
+        self.conn.write(b'Run\r')
+        reads = self.wait_done(self._run_timeout)
+        self._record('running', t0, 0.0, reads)
 
         self._saved = False
+        self._spectrum = None
 
     @property
     def grating(self):
@@ -178,12 +310,20 @@ class SolisProxy(Device):
         if value not in [1, 2]:
             raise ValueError(f"Invalid grating number: {value}")
 
+        t0 = time.time()
         self.command("SetGrating", value)
+        deadline = t0 + self._grating_timeout
+        delay, lag, polls = GRATING_POLL, 0.0, 0
         while True:
+            polls += 1
             if self.grating == f"{value}":
                 break
-            else:
-                time.sleep(4)
+            if time.time() + delay > deadline:
+                raise TimeoutError(f'Grating {value} not reached within {self._grating_timeout} s')
+            time.sleep(delay)
+            lag = delay
+            delay = min(delay * GRATING_BACKOFF, GRATING_POLL_MAX)
+        self._record('grating', t0, lag, polls)
 
     @property
     def wavelength(self):
@@ -245,6 +385,8 @@ class SolisProxy(Device):
         self.disconnect()
         try:
             self.conn = serial.Serial(self._port, baudrate=self._baud, timeout=0.2)
+            # Every proxy reply is one CRLF-terminated line
+            self.io = SerialTransport(self.conn, eol='\r', terminator=b'\r\n')
         except:
             pass
 
@@ -1,7 +1,8 @@
-from ..device import Device
+from ..device import Device, Attr
 
 class FirmataBoard(Device):
     public = ['port']
+    schema = {'port': Attr('str', 'rw')}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,6 +56,14 @@ class FirmataBoard(Device):
 
 class FirmataDigitalPin(Device):
     public = ['port', 'board', 'pin', 'on', 'control', 'control_pin']
+    schema = {
+        'port':        Attr('str',  'rw'),
+        'board':       Attr('str',  'rw'),
+        'pin':         Attr('int',  'rw'),
+        'on':          Attr('bool', 'rw'),
+        'control':     Attr('str',  'rw'),
+        'control_pin': Attr('int',  'rw'),
+    }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -1,9 +1,21 @@
 import random
+from collections import namedtuple
+
+# type is one of 'float', 'int', 'bool', 'str', 'json' or 'array';
+# access is 'r' or 'rw'; unit is free text.
+Attr = namedtuple('Attr', ['type', 'access', 'unit'], defaults=['json', 'rw', None])
 
 
 class Device:
     _common = ['connected', 'attributes']
+    _common_schema = {'connected': Attr('bool', 'r'), 'attributes': Attr('json', 'r')}
     public = []
+    schema = {} # Attr per public/binary attribute
+    binary = [] # Attributes served as raw arrays rather than JSON
+    shadow = {} # Default server-side refresh period (s) per attribute
+    invalidates = {} # Attributes whose shadow copy a write makes stale
+    calls = [] # Methods clients may run with arguments, via POST /<name>/_calls/<method>
+    scheduler = None # Set by the server; threads of the device's own run their I/O on it
 
     def __init__(self, *args, **kwargs):
         pass
@@ -18,6 +30,23 @@ class Device:
     def attributes(self):
         return self.public + self._common
 
+    @classmethod
+    def describe(cls):
+        """
+        Schema of every served attribute; undeclared ones are read-write
+        json. Attributes that a write makes stale are listed under
+        "invalidates".
+        """
+        schema = {}
+        for attr in cls.public + cls._common + cls.binary:
+            spec = cls.schema.get(attr) or cls._common_schema.get(attr) or Attr()
+            if attr in cls.binary:
+                spec = spec._replace(type='array', access='r')
+            schema[attr] = spec._asdict()
+            if cls.invalidates.get(attr):
+                schema[attr]['invalidates'] = list(cls.invalidates[attr])
+        return schema
+
     def __enter__(self):
         self.connect()
         return self
@@ -27,6 +56,7 @@ class Device:
 
 class Debugger(Device):
     public = ['echo', 'echo2','random']
+    schema = {'echo': Attr('json'), 'echo2': Attr('json'), 'random': Attr('float', 'r')}
     connected = True
     _echo = 'echo'
     _echo2 = 'echo2'
@@ -1,24 +1,52 @@
 from serial.rs485 import RS485
 import time
-from ..device import Device
+from ..device import Device, Attr
+from ..transport import SerialTransport
 # from .. import device_directory
 
+# Steps sent back to back, without reading each echo, while the power is
+# more than RAMP_NEAR steps from the target
+RAMP_BURST = 10
+RAMP_NEAR = 2
+STEP_DELAY = 0.2
+
 
 class EQ77(Device):
 
-    public = ['power', 'port']
+    public = ['power', 'port', 'io_stats']
+    schema = {'power': Attr('float', 'rw', '%'), 'port': Attr('str', 'rw'), 'io_stats': Attr('json', 'r')}
+    shadow = {'power': 10}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._port = kwargs.get('com', "COM1")
         self.conn = None
+        self.io = None
+        self._burst = kwargs.get('ramp_burst', RAMP_BURST)
+        self._near = kwargs.get('ramp_near', RAMP_NEAR)
+        self._step_delay = kwargs.get('step_delay', STEP_DELAY)
+
+    @staticmethod
+    def parse(res):
+        if isinstance(res, bytes):
+            res = res.decode('ascii', 'replace')
+        return float(res.strip().split(' = ')[-1].replace('%',''))
 
     def query(self, q):
         if q not in ['U', 'D', 'Q']:
             return ''
-        self.conn.write(q.encode())
-        res = self.conn.read(2048)
-        return float(res.decode().strip().split(' = ')[-1].replace('%',''))
+        return self.parse(self.io.query(q))
+
+    def burst(self, q, n):
+        """Send `n` steps in one write; returns the last power echoed back."""
+        replies = self.io.pipeline([q] * n)
+        if not replies:
+            return self.query('Q')
+        return self.parse(replies[-1])
+
+    @property
+    def io_stats(self):
+        return self.io.stats() if self.io is not None else {}
 
     @property
     def power(self):
@@ -30,18 +58,26 @@ class EQ77(Device):
         if pwr>100 or pwr<15:
             return
         p = self.power
-        while True:
-            if p==pwr:
+        while p != pwr:
+            last = p
+            step = 'D' if p > pwr else 'U'
+            far = int(abs(pwr - p)) - self._near
+            if far > 0:
+                p = self.burst(step, min(far, self._burst))
+            else:
+                p = self.query(step)
+                if p != pwr:
+                    time.sleep(self._step_delay)
+            if p == last:
+                # The source ignored the step (e.g. at its limit); don't spin
                 break
-            elif p>pwr:
-                p = self.query('D')
-            elif p<pwr:
-                p = self.query('U')
-            time.sleep(0.2)
 
     def connect(self):
         try:
             self.conn = RS485(self._port, baudrate=9600, timeout=1)
+            # Single-character commands; the reply ends at the '%' of the
+            # power reading, and anything after it is dropped before the next one
+            self.io = SerialTransport(self.conn, eol='', terminator=b'%', flush=True)
         except:
             return f'Could not connect to port {self._port}.'
 
@@ -1,10 +1,12 @@
-from ..device import Device
+from ..device import Device, Attr
+from ..transport import SerialTransport
 import serial
 
 
 class Switch(Device):
 
-    public = ['on', 'port']
+    public = ['on', 'port', 'io_stats']
+    schema = {'on': Attr('bool', 'rw'), 'port': Attr('str', 'rw'), 'io_stats': Attr('json', 'r')}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -14,7 +16,8 @@ class Switch(Device):
 
     def connect(self):
         try:
-            self.conn = serial.Serial(self._port, baudrate=self._baud, timeout=1)
+            self.conn = SerialTransport(serial.Serial(self._port, baudrate=self._baud, timeout=1),
+                                        eol='\n', terminator=b'\n')
         except:
             return f'Could not connect to port {self._port}.'
 
@@ -28,6 +31,10 @@ class Switch(Device):
         if self.connected:
             self.conn.close()
 
+    @property
+    def io_stats(self):
+        return self.conn.stats() if self.conn is not None else {}
+
     @property
     def on(self):
         resp = self.conn.query("?")
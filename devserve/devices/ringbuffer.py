@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity (timestamp, value) store backed by two float64 arrays.
+    Once full, new samples overwrite the oldest. Running sums are kept
+    on every append, so whole-buffer statistics are O(1); stats(last=k)
+    covers the newest k samples in one vectorised pass.
+
+    Sums are taken relative to the first sample after a clear(), which
+    keeps float64 cancellation small for values like epoch timestamps.
+    They are recomputed from the arrays once per `capacity` samples, so
+    rounding from evictions does not accumulate.
+    """
+    def __init__(self, capacity=100000):
+        self.capacity = int(capacity)
+        self._t = np.empty(self.capacity)
+        self._v = np.empty(self.capacity)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._start = 0
+            self._n = 0
+            self._total = 0
+            self._since_sync = 0
+            self._t0 = self._v0 = None
+            self._st = self._sv = self._sv2 = 0.0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def total(self):
+        """Samples appended since the last clear(), including overwritten ones."""
+        return self._total
+
+    def append(self, t, value):
+        self.extend(np.array([t], dtype=float), np.array([value], dtype=float))
+
+    def extend(self, ts, values):
+        ts = np.asarray(ts, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if len(ts) != len(values):
+            raise ValueError('Timestamps and values differ in length')
+        if not len(ts):
+            return
+        with self._lock:
+            if self._t0 is None:
+                self._t0, self._v0 = ts[0], values[0]
+            self._total += len(ts)
+            if len(ts) > self.capacity:
+                ts, values = ts[-self.capacity:], values[-self.capacity:]
+            k = len(ts)
+            evicted = max(self._n + k - self.capacity, 0)
+            if evicted:
+                idx = (self._start + np.arange(evicted)) % self.capacity
+                self._add(self._t[idx], self._v[idx], -1)
+                self._start = (self._start + evicted) % self.capacity
+                self._n -= evicted
+            idx = (self._start + self._n + np.arange(k)) % self.capacity
+            self._t[idx] = ts
+            self._v[idx] = values
+            self._n += k
+            self._add(ts, values, 1)
+            self._since_sync += k
+            if self._since_sync >= self.capacity:
+                self._resync()
+
+    def _add(self, ts, values, sign):
+        dv = values - self._v0
+        self._st += sign * float(np.sum(ts - self._t0))
+        self._sv += sign * float(np.sum(dv))
+        self._sv2 += sign * float(np.dot(dv, dv))
+
+    def _resync(self):
+        ts, values = self._ordered()
+        self._st = self._sv = self._sv2 = 0.0
+        self._add(ts, values, 1)
+        self._since_sync = 0
+
+    def _ordered(self, last=None):
+        n = self._n if last is None else min(int(last), self._n)
+        idx = (self._start + self._n - n + np.arange(n)) % self.capacity
+        return self._t[idx], self._v[idx]
+
+    def data(self, last=None):
+        """Copies of (timestamps, values), oldest first; the newest `last` only if given."""
+        with self._lock:
+            return self._ordered(last)
+
+    def stats(self, last=None):
+        """(n, mean timestamp, mean value, population std) of the buffer or its newest `last` samples."""
+        with self._lock:
+            if not self._n:
+                return 0, np.nan, np.nan, np.nan
+            if last is None or last >= self._n:
+                n = self._n
+                mean = self._sv / n
+                var = max(self._sv2 / n - mean * mean, 0.0)
+                return n, float(self._t0 + self._st / n), float(self._v0 + mean), var ** 0.5
+            ts, values = self._ordered(last)
+        if not len(ts):
+            return 0, np.nan, np.nan, np.nan
+        return len(ts), float(np.mean(ts)), float(np.mean(values)), float(np.std(values))
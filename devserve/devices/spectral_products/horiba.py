@@ -2,7 +2,7 @@ import serial
 import struct
 import usb.core
 import time
-from ..device import Device
+from ..device import Device, Attr
 
 # Values for Horiba
 LANG_ID_US_ENGLISH = 0x489
@@ -29,9 +29,20 @@ SET_SLITWIDTH = 33
 READ_SLITWIDTH = 32
 IS_BUSY = 5
 
+# Motion completion: poll IS_BUSY every BUSY_POLL s, for at most the
+# timeout. The old fixed sleeps remain the fallback if it cannot be read.
+BUSY_POLL = 0.05
+GR_TIMEOUT = 30
+WL_TIMEOUT = 15
+GR_SLEEP = 7.5
+WL_SLEEP = 2.5
+WL_TOLERANCE = 0.01 # nm; closer targets count as already reached
+
 class horiba(Device):
 
     public = ['gr','wl','sl']
+    schema = {'gr': Attr('int', 'rw'), 'wl': Attr('float', 'rw', 'nm'), 'sl': Attr('float', 'rw', 'um')}
+    shadow = {'gr': 60, 'wl': 10}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -40,6 +51,27 @@ class horiba(Device):
         self._wl = None
         self._sl = None
 
+    def is_busy(self):
+        qu = self.conn.ctrl_transfer(B_REQUEST_IN, BM_REQUEST_TYPE, wIndex=IS_BUSY, data_or_wLength=4)
+        return struct.unpack("<i", qu)[0] != 0
+
+    def wait_idle(self, timeout, fallback):
+        """Returns once the motor stops; TimeoutError if it is still moving after `timeout` s."""
+        t0 = time.time()
+        deadline = t0 + timeout
+        time.sleep(BUSY_POLL)
+        while True:
+            try:
+                busy = self.is_busy()
+            except usb.core.USBError:
+                time.sleep(max(fallback - (time.time() - t0), 0))
+                return
+            if not busy:
+                return
+            if time.time() > deadline:
+                raise TimeoutError(f'horiba still moving after {timeout} s')
+            time.sleep(BUSY_POLL)
+
     ### grating functionality ###
     def gr_query(self):
         qu = self.conn.ctrl_transfer(B_REQUEST_IN, BM_REQUEST_TYPE, wIndex=READ_TURRET, data_or_wLength=4)
@@ -52,8 +84,10 @@ class horiba(Device):
 
     @gr.setter
     def gr(self,value):
+        if self.gr_query() == int(value):
+            return
         self.conn.ctrl_transfer(B_REQUEST_OUT,BM_REQUEST_TYPE,wIndex=SET_TURRET,data_or_wLength=struct.pack("<i",value))
-        time.sleep(7.5)
+        self.wait_idle(GR_TIMEOUT, GR_SLEEP)
 
     ### wavelength functionality ###
     def wl_query(self):
@@ -67,8 +101,10 @@ class horiba(Device):
 
     @wl.setter
     def wl(self,value):
+        if abs(self.wl_query() - value) < WL_TOLERANCE:
+            return
         self.conn.ctrl_transfer(B_REQUEST_OUT, BM_REQUEST_TYPE, wIndex=SET_WAVELENGTH, data_or_wLength=struct.pack("<f",value))
-        time.sleep(2.5)
+        self.wait_idle(WL_TIMEOUT, WL_SLEEP)
 
 
 
@@ -8,16 +8,31 @@
 # --------  ----------  -------------------------------------------------
 # gsimond   20140922    modified from Adrien.Deline version
 # jmosbacher 20181020   modified to fit my needs
-from ..device import Device
+from ..device import Device, Attr
+from ..transport import SerialTransport
 # from .. import device_directory
-import io,re,sys
+import re,sys
 
 import serial
 
 
 class FW102C(Device):
-    public = [ 'speed', 'sensors', 'port', 'cached_status', 'filter', 'position',]
+    public = [ 'speed', 'sensors', 'port', 'cached_status', 'filter', 'position', 'io_stats']
+    schema = {
+        'speed':         Attr('int',  'rw'),
+        'sensors':       Attr('int',  'rw'),
+        'port':          Attr('str',  'rw'),
+        'cached_status': Attr('json', 'r'),
+        'filter':        Attr('json', 'rw'),
+        'position':      Attr('int',  'rw'),
+        'io_stats':      Attr('json', 'r'),
+    }
+    shadow = {'position': 10, 'speed': 300, 'sensors': 300}
+    invalidates = {'position': ['filter']}
     regerr = re.compile("Command error.*")
+    # Replies echo the command, then the answer, then a '> ' prompt; all CR separated
+    prompt = b'> '
+    lines = re.compile(r'\r\n?|\n')
     """
        Class to control the ThorLabs FW102C filter wheel
        
@@ -56,6 +71,7 @@ class FW102C(Device):
         super().__init__(*args, **kwargs)
         self._port = kwargs.get('com', "COM1")
         self._fw = None
+        self._io = None
         self._status = {}
         self._filter_map = kwargs.get('filter_map', {})
 
@@ -87,13 +103,11 @@ class FW102C(Device):
             self._fw = serial.Serial(port=self.port, baudrate=115200,
                                   bytesize=8, parity='N', stopbits=1,
                                   timeout=1, xonxoff=0, rtscts=0)
-            self._sio = io.TextIOWrapper(io.BufferedRWPair(self._fw, self._fw, 1),
-                                         newline=None, encoding='ascii')
-            self._sio.write(u'*idn?\r')
-            self.devInfo = self._sio.readlines(2048)[1][:-1]
+            self._io = SerialTransport(self._fw, eol='\r', terminator=self.prompt, flush=True)
+            self.devInfo = self._answer(self._io.request('*idn?'))
 
             for attr in self.public:
-                if attr == 'cached_status':
+                if attr in ('cached_status', 'io_stats'):
                     continue
                 self._status[attr] = getattr(self, attr)
 
@@ -105,6 +119,17 @@ class FW102C(Device):
             print( 'Port {0} is unavailable: {1}'.format(self.port, ex))
             return
     
+    def _reply_lines(self, reply):
+        return self.lines.split(reply.decode('ascii', 'replace'))
+
+    def _answer(self, reply):
+        lines = self._reply_lines(reply)
+        return lines[1] if len(lines) > 1 else ''
+
+    @property
+    def io_stats(self):
+        return self._io.stats() if self._io is not None else {}
+
     @property
     def cached_status(self):
         return self._status
@@ -128,11 +153,7 @@ class FW102C(Device):
             return "DEVICE NOT OPEN"
         #end if
         
-        ans = 'ERROR'
-        self._sio.flush()
-        res = self._sio.write(cmdstr+u'\r')
-        if res:
-            ans = self._sio.readlines(2048)[1][:-1]
+        ans = self._answer(self._io.request(cmdstr))
         #print 'queryans=',repr(ans)
         return ans
     # end def query
@@ -147,11 +168,8 @@ class FW102C(Device):
             return "DEVICE NOT OPEN"
         #end if
         
-        ans = 'ERROR'
-        self._sio.flush()
         cmd = cmdstr.split('=')[0]
-        res = self._sio.write(cmdstr+u'\r')
-        ans = self._sio.readlines(2048)
+        ans = self._reply_lines(self._io.request(cmdstr))
 
         errors = [m.group(0) for l in ans for m in [self.regerr.search(l)] if m]
         #print 'res=',repr(res),'ans=',repr(ans),cmd
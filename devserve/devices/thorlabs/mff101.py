@@ -1,6 +1,6 @@
 # Stolen from some issue thread on github
 
-from ..device import Device
+from ..device import Device, Attr
 # from .. import device_directory
 import io,re,sys
 import serial
@@ -27,6 +27,8 @@ class Status(Enum):
 
 class MFF101(Device):
     public = ['position', 'info', 'port']
+    schema = {'position': Attr('str', 'rw'), 'info': Attr('str', 'r'), 'port': Attr('str', 'rw')}
+    shadow = {'position': 10, 'info': 300}
     # Raw byte commands for "MGMSG_MOT_MOVE_JOG".
 
 
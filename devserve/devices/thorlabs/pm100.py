@@ -2,45 +2,235 @@ import serial
 import struct
 import time
 import threading
-
-import visa
-from ThorlabsPM100 import ThorlabsPM100
+from ctypes import byref, c_bool, c_double, c_int16
 
 import numpy as np
 
-from ..device import Device
+from ..device import Device, Attr
+from ..ringbuffer import RingBuffer
+from ...TLPM import TLPM
+
+# The meter captures at most one second per sequence
+MAX_SEQUENCE_US = 1000000
+TLPM_ATTR_SET_VAL = 0
+
+
+class ScpiMeter:
+    """The meter through pyvisa and the ThorlabsPM100 SCPI layer."""
+    def __init__(self, port, dll=None):
+        import visa
+        from ThorlabsPM100 import ThorlabsPM100
+        self._rm = visa.ResourceManager()
+        self._inst = self._rm.open_resource(port, timeout=1)
+        self.pm = ThorlabsPM100(inst=self._inst)
+        self.pm.configure.scalar.power()
+        self._port = port
+        self._dll = dll
+        self._sequencer = None
+
+    def close(self):
+        if self._sequencer is not None:
+            self._sequencer.close()
+            self._sequencer = None
+        self._inst.close()
+        self._rm.close()
+
+    @property
+    def mode(self):
+        return self.pm.getconfigure
+
+    def configure(self, unit):
+        if unit == 0:
+            self.pm.configure.scalar.power()
+        elif unit == 1:
+            self.pm.configure.scalar.current.dc()
+
+    def read(self):
+        reading = None
+        while reading is None:
+            reading = self.pm.read
+        return reading
+
+    @property
+    def count(self):
+        return self.pm.sense.average.count
+
+    @count.setter
+    def count(self, value):
+        self.pm.sense.average.count = value
+
+    @property
+    def wavelength(self):
+        return self.pm.sense.correction.wavelength
+
+    @wavelength.setter
+    def wavelength(self, value):
+        self.pm.sense.correction.wavelength = value
+
+    @property
+    def autorange(self):
+        return self.pm.sense.power.dc.range.auto == 1
+
+    @autorange.setter
+    def autorange(self, value):
+        self.pm.sense.power.dc.range.auto = int(value)
+
+    def sequence(self, n, interval):
+        # SCPI has no sequence mode, so bursts open a second session on the
+        # meter through the vendor driver, next to the VISA one. Only one of
+        # them talks at a time: both are driven from the device scheduler.
+        # Averaging, wavelength and range are meter settings and apply to both.
+        if self._sequencer is None:
+            self._sequencer = TLPMMeter(self._port, self._dll)
+        return self._sequencer.sequence(n, interval)
+
+
+class TLPMMeter:
+    """The meter through the vendor driver (devserve/TLPM.py): one DLL call per reading."""
+    def __init__(self, port, dll=None):
+        self.tlpm = TLPM(dll)
+        self.tlpm.open(port.encode(), c_bool(True), c_bool(False))
+        self._current = False
+        self._values = np.empty(0)
+
+    def close(self):
+        self.tlpm.close()
+
+    @property
+    def mode(self):
+        return 'CURR' if self._current else 'POW'
+
+    def configure(self, unit):
+        if unit in (0, 1):
+            self._current = unit == 1
+
+    def read(self):
+        value = c_double()
+        if self._current:
+            self.tlpm.measCurrent(byref(value))
+        else:
+            self.tlpm.measPower(byref(value))
+        return value.value
+
+    @property
+    def count(self):
+        value = c_int16()
+        self.tlpm.getAvgCnt(byref(value))
+        return value.value
+
+    @count.setter
+    def count(self, value):
+        self.tlpm.setAvgCnt(c_int16(value))
+
+    @property
+    def wavelength(self):
+        value = c_double()
+        self.tlpm.getWavelength(c_int16(TLPM_ATTR_SET_VAL), byref(value))
+        return value.value
+
+    @wavelength.setter
+    def wavelength(self, value):
+        self.tlpm.setWavelength(c_double(float(value)))
+
+    @property
+    def autorange(self):
+        value = c_int16()
+        self.tlpm.getPowerAutorange(byref(value))
+        return value.value == 1
+
+    @autorange.setter
+    def autorange(self, value):
+        self.tlpm.setPowerAutoRange(c_int16(int(value)))
+
+    def sequence(self, n, interval):
+        # Filled in place by the driver; the buffer is reused by the next burst
+        if len(self._values) < n:
+            self._values = np.empty(n)
+        if self._current:
+            return self.tlpm.currentSequence(n, interval, self._values)
+        return self.tlpm.powerSequence(n, interval, self._values)
+
+
+METERS = {'visa': ScpiMeter, 'tlpm': TLPMMeter}
 
 
 class PM100(Device):
-    public = [     'port',   'unit',                       # Connection properties
+    public = [     'port',   'unit',      'backend',       # Connection properties
                   'count',   'wavelength',                 # Device configuration
                    'mode',    'autorange', 'record_delay', # .
-              'save_path', 'buffer_stats',                 # Data manipulation
+                  'burst', 'burst_count', 'burst_interval', # .
+              'save_path', 'buffer_stats',  'buffer_size', # Data manipulation
+           'stats_window',                                 # .
                   'power',    'recording',        'saved'] # Operations
 
+    schema = {
+        'port':         Attr('str',   'rw'),
+        'backend':      Attr('str',   'rw'),
+        'unit':         Attr('json',  'rw'),
+        'count':        Attr('int',   'rw'),
+        'wavelength':   Attr('float', 'rw', 'nm'),
+        'mode':         Attr('str',   'r'),
+        'autorange':    Attr('bool',  'rw'),
+        'record_delay': Attr('float', 'rw', 's'),
+        'burst':        Attr('bool',  'rw'),
+        'burst_count':  Attr('int',   'rw'),
+        'burst_interval': Attr('int', 'rw', 'us'),
+        'save_path':    Attr('str',   'rw'),
+        'buffer_stats': Attr('json',  'r',  'n, s, W, W'),
+        'buffer_size':  Attr('int',   'rw'),
+        'stats_window': Attr('int',   'rw'),
+        'power':        Attr('float', 'r',  'W'),
+        'recording':    Attr('bool',  'rw'),
+        'saved':        Attr('bool',  'rw'),
+    }
+
+    shadow = {'unit': 60, 'wavelength': 60, 'count': 60, 'mode': 60}
+    calls = ['read_adaptive']
+    invalidates = {'unit': ['mode']}
+
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._port = kwargs.get('com', "USB0::0x1313::0x8072::P2005497::INSTR")
+        # 'visa' (SCPI over pyvisa) or 'tlpm' (the vendor driver); tlpm_dll
+        # substitutes the driver library, e.g. with a stand-in for testing
+        self._backend = kwargs.get('backend', 'visa')
+        self._dll = kwargs.get('tlpm_dll')
         self.pm = None
         self._unit = None
         self._recording = False
         self.record_delay = 0.05
         self._save_path = None
         self._saved = False
-        self._cache = {"ts":[], "ms": []}
+        self._buffer = RingBuffer(kwargs.get('buffer_size', 100000))
+        self.stats_window = 0
+        # Burst recording reads whole measurement sequences through the
+        # vendor driver; best with autorange off and the input filter off
+        self.burst = False
+        self._burst_count = 100
+        self._burst_interval = 1000
 
 
     @property
     def unit(self):
-        return self.pm.getconfigure
+        return self.pm.mode
 
     @unit.setter
     def unit(self,value):
-        if value == 0:
-            self.pm.configure.scalar.power()
-        elif value == 1:
-            self.pm.configure.scalar.current.dc()
+        self.pm.configure(value)
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @backend.setter
+    def backend(self, value):
+        if value not in METERS:
+            raise ValueError(f'Unknown backend {value!r}; use one of {list(METERS)}')
+        self._backend = value
+        if self.connected:
+            self.disconnect()
+            self.connect()
 
     @property
     def port(self):
@@ -60,16 +250,48 @@ class PM100(Device):
     def power(self):
         if self.pm is None:
             return
-        reading = None
-        while reading is None:
-            reading = self.pm.read
-        return reading
+        return self.pm.read()
+
+    def read_adaptive(self, precision=1e-3, time_budget=5.0, min_samples=3):
+        """
+        Average single readings until the relative standard error of the
+        mean reaches `precision` or `time_budget` runs out. Returns
+        {"value", "n", "sem", "rel_sem", "converged", "elapsed"}.
+
+        Blocks for up to time_budget, so it is a call rather than an
+        attribute: POST /<name>/_calls/read_adaptive, or
+        DeviceClient.call('read_adaptive', precision=..., time_budget=...).
+        """
+        if self.pm is None:
+            raise ConnectionError(f'Power meter on {self._port} is not connected')
+        min_samples = max(int(min_samples), 2)
+        n, mean, m2 = 0, 0.0, 0.0
+        sem = rel_sem = float('inf')
+        t0 = time.time()
+        while True:
+            # Welford's running mean and variance
+            x = self.pm.read()
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            if n >= 2:
+                sem = (m2 / (n - 1) / n) ** 0.5
+                rel_sem = sem / abs(mean) if mean else float('inf')
+            if n >= min_samples and rel_sem <= precision:
+                break
+            if time.time() - t0 >= time_budget:
+                break
+        return {"value": mean, "n": n, "sem": sem if n >= 2 else None,
+                "rel_sem": rel_sem if n >= 2 else None,
+                "converged": n >= min_samples and rel_sem <= precision,
+                "elapsed": time.time() - t0}
 
     @property
     def count(self):
         if self.pm is None:
             return
-        return self.pm.sense.average.count
+        return self.pm.count
 
     @count.setter
     def count(self, value):
@@ -77,45 +299,44 @@ class PM100(Device):
         if self.pm is None:
             return
         if value >700:
-            self.pm.sense.average.count = 700
+            self.pm.count = 700
             return
         elif value>0:
-            self.pm.sense.average.count = value
+            self.pm.count = value
 
     @property
     def wavelength(self):
-        return self.pm.sense.correction.wavelength
+        return self.pm.wavelength
 
     @wavelength.setter
     def wavelength(self, value):
-        self.pm.sense.correction.wavelength = value
+        self.pm.wavelength = value
 
     @property
     def mode(self):
-        return self.pm.getconfigure
+        return self.pm.mode
 
     @property
     def autorange(self):
-        return self.pm.sense.power.dc.range.auto is 1
+        return self.pm.autorange
 
     @autorange.setter
     def autorange(self, value):
         if value in [0, False, 'False', 'false', 'off']:
-            self.pm.sense.power.dc.range.auto = 0
+            self.pm.autorange = 0
         elif value in [1, True, 'True', 'true','on']:
-            self.pm.sense.power.dc.range.auto = 1
+            self.pm.autorange = 1
 
     def connect(self):
         try:
-            rm = visa.ResourceManager()
-            inst = rm.open_resource(self._port, timeout=1)
-            self.pm = ThorlabsPM100(inst=inst)
-            self.pm.configure.scalar.power()
+            self.pm = METERS[self._backend](self._port, self._dll)
         except:
-            pass
+            self.pm = None
 
     def disconnect(self):
-        pass
+        if self.pm is not None:
+            self.pm.close()
+            self.pm = None
 
     @property
     def connected(self):
@@ -139,15 +360,70 @@ class PM100(Device):
             self._recording = True
             self._thread.start()
 
+    def _background(self, fn):
+        # Queue behind client commands on the server's scheduler, if any
+        if self.scheduler is None:
+            return fn()
+        return self.scheduler.call(fn, lane='background')
+
+    def _timed_power(self):
+        t0 = time.time()
+        m = self.power
+        t1 = time.time()
+        return t0/2 + t1/2, m
+
     def recorder(self):
-        ts = self._cache['ts'] = []
-        ms = self._cache['ms'] = []
+        self._buffer.clear()
         while self._recording:
-            t0 = time.time()
-            ms.append(self.power)
-            t1 = time.time()
-            ts.append(t0/2 + t1/2)
-            time.sleep(self.record_delay)
+            if self.burst:
+                try:
+                    self._buffer.extend(*self._background(self.read_sequence))
+                    continue
+                except Exception as e:
+                    print(f'Burst read failed, recording single readings: {e!r}')
+                    self.burst = False
+            self._buffer.append(*self._background(self._timed_power))
+            if self.record_delay:
+                time.sleep(self.record_delay)
+
+    def read_sequence(self):
+        """
+        One burst of burst_count readings, burst_interval us apart, as
+        (timestamps, powers) arrays. The sample times are spread over the
+        time the call took. The powers may share memory with the next burst.
+        """
+        n = self._burst_count
+        t0 = time.time()
+        values = self.pm.sequence(n, self._burst_interval)
+        t1 = time.time()
+        ts = np.linspace(t0, t1, n + 1)[1:]
+        return ts, values
+
+    @property
+    def burst_count(self):
+        return self._burst_count
+
+    @burst_count.setter
+    def burst_count(self, value):
+        self._burst_count = max(1, min(int(value), MAX_SEQUENCE_US // self._burst_interval))
+
+    @property
+    def burst_interval(self):
+        return self._burst_interval
+
+    @burst_interval.setter
+    def burst_interval(self, value):
+        self._burst_interval = max(100, int(value))
+        self.burst_count = self._burst_count
+
+    @property
+    def buffer_size(self):
+        return self._buffer.capacity
+
+    @buffer_size.setter
+    def buffer_size(self, value):
+        if int(value) != self._buffer.capacity:
+            self._buffer = RingBuffer(int(value))
 
     @property
     def save_path(self):
@@ -166,21 +442,11 @@ class PM100(Device):
     def saved(self, value):
         if self.save_path is None:
             return
-        ts = self._cache['ts']
-        ms = self._cache['ms']
-        with open(self.save_path, 'w') as f:
-            for t,m in zip(ts, ms):
-                print(t, m, sep=',', file=f) 
+        ts, ms = self._buffer.data()
+        np.savetxt(self.save_path, np.column_stack([ts, ms]), delimiter=',', fmt='%.17g')
         self._saved = True
 
     @property
     def buffer_stats(self):
-        t = self._cache['ts']
-        p = self._cache['ms']
-
-        n_meas = len    (t)
-        t_mean = np.mean(t)
-        p_mean = np.mean(p)
-        p_std  = np.std (p)
-
-        return n_meas, t_mean, p_mean, p_std
+        """Over the newest stats_window samples, or the whole buffer when it is 0."""
+        return self._buffer.stats(self.stats_window or None)
@@ -1,8 +1,15 @@
-from ..device import Device
+from ..device import Device, Attr
 import ast
 
 class PRMTZ8(Device):
     public = ['position', 'port', 'zero', 'step', 'reverse']
+    schema = {
+        'position': Attr('int',   'rw'),
+        'port':     Attr('int',   'rw'),
+        'zero':     Attr('float', 'rw', 'deg'),
+        'step':     Attr('float', 'rw', 'deg'),
+        'reverse':  Attr('bool',  'rw'),
+    }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+
+class SerialTransport:
+    """
+    Line-oriented request/response over a serial port. A reply is read
+    until the device's terminator (or prompt) arrives rather than for a
+    fixed byte count, so a call costs the device's answer time instead of
+    the port timeout. The timeout only bounds a device that stays silent.
+
+        io = SerialTransport(serial.Serial(port, 115200, timeout=1),
+                             eol='\r', terminator=b'> ')
+        io.query('pos?')
+
+    `eol` ends every write; `flush` drops stale input before each request.
+    Every call is timed; see stats().
+    """
+    def __init__(self, conn, eol='\r', terminator=b'\r\n', encoding='ascii', flush=False, nsamples=50):
+        self.conn = conn
+        self.eol = eol
+        self.terminator = terminator
+        self.encoding = encoding
+        self.flush = flush
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._timeouts = 0
+        self._busy = 0.0
+        self._samples = deque(maxlen=nsamples)
+
+    @property
+    def is_open(self):
+        return self.conn is not None and self.conn.is_open
+
+    def close(self):
+        self.conn.close()
+
+    def write(self, cmd):
+        self.conn.write(f'{cmd}{self.eol}'.encode(self.encoding))
+
+    def read_reply(self, terminator=None):
+        """Raw bytes up to and including the terminator; whatever arrived if it times out."""
+        terminator = terminator or self.terminator
+        data = self.conn.read_until(terminator)
+        if not data.endswith(terminator):
+            with self._lock:
+                self._timeouts += 1
+        return data
+
+    def request(self, cmd, terminator=None):
+        """Write `cmd` and return the raw reply."""
+        t0 = time.perf_counter()
+        with self._lock:
+            self._calls += 1
+        if self.flush:
+            self.conn.reset_input_buffer()
+        self.write(cmd)
+        data = self.read_reply(terminator)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._busy += elapsed
+            self._samples.append(elapsed)
+        return data
+
+    def pipeline(self, cmds, terminator=None):
+        """
+        Write all `cmds` at once, then read one reply per command. Stops
+        at the first reply that times out, so the list may be shorter.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            self._calls += 1
+        if self.flush:
+            self.conn.reset_input_buffer()
+        self.conn.write(''.join(f'{cmd}{self.eol}' for cmd in cmds).encode(self.encoding))
+        terminator = terminator or self.terminator
+        replies = []
+        for _ in cmds:
+            data = self.read_reply(terminator)
+            if not data.endswith(terminator):
+                break
+            replies.append(data)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._busy += elapsed
+            self._samples.append(elapsed)
+        return replies
+
+    def query(self, cmd, terminator=None):
+        """Write `cmd` and return the decoded, stripped reply."""
+        return self.request(cmd, terminator).decode(self.encoding, 'replace').strip()
+
+    def command(self, cmd, terminator=None):
+        """Same as query, for writes whose reply is only an acknowledgement."""
+        return self.query(cmd, terminator)
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            return {
+                "calls":    self._calls,
+                "timeouts": self._timeouts,
+                "busy":     self._busy,
+                "median":   samples[len(samples) // 2] if samples else None,
+                "max":      samples[-1] if samples else None,
+            }
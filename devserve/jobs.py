@@ -0,0 +1,84 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
+
+
+class Job:
+    def __init__(self, id, future):
+        self.id = id
+        self.future = future
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def status(self):
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() is not None else 'done'
+        return 'running' if self.started is not None else 'queued'
+
+    def describe(self):
+        info = {"id": self.id, "status": self.status, "submitted": self.submitted,
+                "started": self.started, "finished": self.finished}
+        status = info["status"]
+        if status == 'done':
+            info["result"] = self.future.result()
+        elif status == 'failed':
+            info["error"] = repr(self.future.exception())
+        return info
+
+
+class JobTable:
+    """
+    Long-running device commands that clients poll instead of waiting
+    on an open request. Jobs run on the device CommandScheduler like any
+    other command; only the most recent `keep` jobs are remembered.
+    """
+    def __init__(self, scheduler, keep=100):
+        self.scheduler = scheduler
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, lane='interactive', deadline=None):
+        with self._lock:
+            id = str(next(self._ids))
+        job = None
+
+        def run():
+            job.started = time.time()
+            try:
+                return fn(*args)
+            finally:
+                job.finished = time.time()
+
+        job = Job(id, self.scheduler.submit(run, lane=lane, deadline=deadline))
+        with self._lock:
+            self._jobs[id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, id):
+        with self._lock:
+            return self._jobs.get(id)
+
+    def wait(self, id, timeout):
+        job = self.get(id)
+        if job is not None and timeout > 0:
+            wait([job.future], timeout)
+        return job
+
+    def cancel(self, id):
+        """Only queued jobs can be cancelled; hardware calls are never interrupted."""
+        job = self.get(id)
+        return job is not None and job.future.cancel()
+
+    def list(self):
+        with self._lock:
+            return [job.describe() for job in self._jobs.values()]
@@ -0,0 +1,95 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PlanError(RuntimeError):
+    """A stage had failed writes; later stages were not started. See `.report`."""
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def same(a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) \
+            and not isinstance(a, bool) and not isinstance(b, bool):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def _stage_of(device, attr, stages):
+    """Index of the first stage whose selectors match; '*' matches anything."""
+    default = len(stages)
+    for i, selectors in enumerate(stages):
+        for sel in ([selectors] if isinstance(selectors, str) else selectors):
+            if sel in (f'{device}.{attr}', device):
+                return i
+            if sel == '*':
+                default = min(default, i)
+    return default
+
+
+def plan(target, current, stages=None):
+    """
+    Split {device: {attr: value}} into the writes that change something.
+
+    `stages` orders the writes: a list whose entries are selectors
+    ('device.attr', 'device' or '*'), or lists of selectors. All writes
+    of one stage finish before the next stage starts; writes that match
+    nothing run last. Within a stage devices move concurrently, and
+    each device receives its attributes in the order given.
+
+    Returns (list of {device: {attr: value}} per stage, skipped {device: [attrs]}).
+    """
+    stages = stages or []
+    steps = [{} for _ in range(len(stages) + 1)]
+    skipped = {}
+    for device, state in target.items():
+        known = current.get(device, {})
+        for attr, value in state.items():
+            if attr in known and same(known[attr], value):
+                skipped.setdefault(device, []).append(attr)
+                continue
+            steps[_stage_of(device, attr, stages)].setdefault(device, {})[attr] = value
+    return [step for step in steps if step], skipped
+
+
+def execute(devices, steps, max_workers=None):
+    """
+    Run planned stages with DeviceClient.set_state semantics. Returns a
+    report with the duration of every device write, each stage's slowest
+    device (the critical path) and the total.
+    """
+    report = {"stages": [], "critical_path": [], "total": 0.0}
+    t_start = time.time()
+
+    def write(name, state):
+        t0 = time.time()
+        device = devices[name]
+        written = device._put_batch(state) if device._batch else None
+        if written is None:
+            device.set_state(state)
+            written = state
+        return time.time() - t0, [attr for attr in state if attr not in written]
+
+    with ThreadPoolExecutor(max_workers or max(len(devices), 1)) as pool:
+        for step in steps:
+            t0 = time.time()
+            futures = {name: pool.submit(write, name, state) for name, state in step.items()}
+            durations, errors = {}, {}
+            for name, future in futures.items():
+                try:
+                    durations[name], failed = future.result()
+                except Exception as e:
+                    durations[name], failed = time.time() - t0, [repr(e)]
+                if failed:
+                    errors[name] = failed
+            slowest = max(durations, key=durations.get)
+            report["stages"].append({"writes": step, "durations": durations,
+                                     "duration": time.time() - t0, "errors": errors})
+            report["critical_path"].append((slowest, durations[slowest]))
+            if errors:
+                report["total"] = time.time() - t_start
+                raise PlanError(f'Could not apply {errors}', report)
+    report["total"] = time.time() - t_start
+    return report
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get('DEVSERVE_REGISTRY',
+                              os.path.join(os.path.expanduser('~'), '.devserve', 'registry'))
+HEARTBEAT = 5.0
+
+
+class Registry:
+    """
+    Directory of running device servers on this machine, one JSON file
+    per device with its name, address, schema and readiness.
+
+    Servers refresh their entry every `heartbeat` seconds; entries that
+    have not been refreshed for three heartbeats belong to servers that
+    died and are ignored.
+    """
+    def __init__(self, path=DEFAULT_PATH, heartbeat=HEARTBEAT):
+        self.path = path
+        self.heartbeat = heartbeat
+        self._published = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __getstate__(self):
+        # Passed to server processes; only the location travels
+        return {"path": self.path, "heartbeat": self.heartbeat}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name}.json')
+
+    def _write(self, entry):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file(entry["name"]) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._file(entry["name"]))
+
+    def publish(self, name, addr, schema=None, ready=False):
+        entry = {"name": name, "addr": addr, "schema": schema, "ready": ready,
+                 "pid": os.getpid(), "heartbeat": time.time()}
+        with self._lock:
+            self._published[name] = entry
+            self._write(entry)
+        self._start()
+
+    def set_ready(self, name, ready=True):
+        with self._lock:
+            entry = self._published.get(name)
+            if entry is not None:
+                entry.update(ready=ready, heartbeat=time.time())
+                self._write(entry)
+
+    def remove(self, name):
+        with self._lock:
+            self._published.pop(name, None)
+            try:
+                os.remove(self._file(name))
+            except OSError:
+                pass
+            if not self._published:
+                self._stop.set()
+
+    def entries(self, ready_only=True):
+        """{name: entry} of live devices."""
+        try:
+            files = [f for f in os.listdir(self.path) if f.endswith('.json')]
+        except OSError:
+            return {}
+        now = time.time()
+        found = {}
+        for filename in files:
+            try:
+                with open(os.path.join(self.path, filename)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - entry.get("heartbeat", 0) > 3 * self.heartbeat:
+                continue
+            if ready_only and not entry.get("ready"):
+                continue
+            found[entry["name"]] = entry
+        return found
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and not self._stop.is_set():
+                return
+            # A fresh event per thread: one stopped by remove() exits even
+            # if a publish() starts its successor before it wakes
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._beat, args=(self._stop,), daemon=True)
+            self._thread.start()
+
+    def _beat(self, stop):
+        while not stop.wait(self.heartbeat):
+            with self._lock:
+                for entry in self._published.values():
+                    entry["heartbeat"] = time.time()
+                    try:
+                        self._write(entry)
+                    except OSError:
+                        pass
@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+
+
+class CircuitOpen(ConnectionError):
+    pass
+
+
+class RetryPolicy:
+    """
+    How long to wait for one request and how often to try again.
+    Retries back off exponentially from `backoff` up to `max_backoff`
+    seconds, each delay randomised by +-`jitter` (a fraction).
+    """
+    def __init__(self, tries=3, timeout=30, backoff=0.1, factor=2.0, max_backoff=2.0, jitter=0.2):
+        self.tries = tries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def delays(self):
+        """Sleep before each retry; yields tries - 1 values."""
+        delay = self.backoff
+        for _ in range(self.tries - 1):
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay * self.factor, self.max_backoff)
+
+    def __repr__(self):
+        return f'RetryPolicy(tries={self.tries}, timeout={self.timeout}, backoff={self.backoff})'
+
+
+# Reads are safe to repeat. Writes may start an exposure or a move, so
+# they are tried once and get longer for slow hardware.
+READ_POLICY = RetryPolicy()
+WRITE_POLICY = RetryPolicy(tries=1, timeout=300)
+
+
+class CircuitBreaker:
+    """
+    Fails fast once a device is known to be down. After `threshold`
+    failed calls in a row the circuit opens and calls raise CircuitOpen
+    without touching the network. After `reset_timeout` seconds one
+    trial call is let through; if it succeeds the circuit closes.
+    """
+    def __init__(self, threshold=5, reset_timeout=10.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "retries": 0, "opened": 0}
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.time() - self._opened_at < self.reset_timeout:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpen(f'Device marked down after {self._failures} failures; '
+                                      f'retrying in {self.reset_timeout - (time.time() - self._opened_at):.1f} s')
+                self.state = 'half-open'
+            self.counters["calls"] += 1
+
+    def retried(self):
+        with self._lock:
+            self.counters["retries"] += 1
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = 'closed'
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self.counters["failures"] += 1
+            if self.state == 'half-open' or self._failures >= self.threshold:
+                if self.state != 'open':
+                    self.counters["opened"] += 1
+                self.state = 'open'
+                self._opened_at = time.time()
+
+    def reset(self):
+        self.success()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, state=self.state, consecutive_failures=self._failures)
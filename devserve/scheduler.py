@@ -0,0 +1,105 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# Lower runs first. Within a lane commands run in submission order.
+LANES = {'interactive': 0, 'scan': 1, 'background': 2}
+_STOP = len(LANES)
+
+
+class DeadlineExpired(TimeoutError):
+    pass
+
+
+class CommandScheduler:
+    """
+    Runs every hardware call for one device on a single worker thread,
+    taking the most urgent lane first: interactive, then scan, then
+    background telemetry. A running command is never interrupted, so a
+    background read can delay a scan command by at most one call.
+
+    A command may carry a deadline (absolute time.time()). It is dropped
+    if it has not started by then, and the caller gets DeadlineExpired.
+    """
+    def __init__(self, name, nsamples=50):
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._depth = {lane: 0 for lane in LANES}
+        self._served = {lane: 0 for lane in LANES}
+        self._expired = {lane: 0 for lane in LANES}
+        self._waited = {lane: 0.0 for lane in LANES}
+        self._busy = 0.0
+        self._calls = deque(maxlen=nsamples)
+        self._thread = threading.Thread(target=self._run, name=f'{name}-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, lane='interactive', deadline=None, record=True):
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane}. Must be one of {list(LANES)}")
+        future = Future()
+        with self._lock:
+            self._depth[lane] += 1
+        self._queue.put((LANES[lane], next(self._order), lane, future, fn, args, deadline, time.time(), record))
+        return future
+
+    def call(self, fn, *args, lane='interactive', deadline=None, record=True):
+        future = self.submit(fn, *args, lane=lane, deadline=deadline, record=record)
+        if deadline is None:
+            return future.result()
+        try:
+            return future.result(max(deadline - time.time(), 0))
+        except FutureTimeout:
+            # Still queued: drop it. Already running: let it finish.
+            if future.cancel():
+                raise DeadlineExpired(f'{self.name}: deadline expired before the command started')
+            return future.result()
+
+    def _run(self):
+        while True:
+            _, _, lane, future, fn, args, deadline, t_submit, record = self._queue.get()
+            if future is None:
+                break
+            t0 = time.time()
+            with self._lock:
+                self._depth[lane] -= 1
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._expired[lane] += 1
+                continue
+            if deadline is not None and t0 > deadline:
+                with self._lock:
+                    self._expired[lane] += 1
+                future.set_exception(DeadlineExpired(f'{self.name}: deadline expired before the command started'))
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            t1 = time.time()
+            with self._lock:
+                self._served[lane] += 1
+                self._waited[lane] += t0 - t_submit
+                self._busy += t1 - t0
+                if record:
+                    self._calls.append(t1 - t0)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "depth":     dict(self._depth),
+                "served":    dict(self._served),
+                "expired":   dict(self._expired),
+                "mean_wait": {lane: self._waited[lane] / self._served[lane] if self._served[lane] else 0.0
+                              for lane in LANES},
+                "busy":      self._busy,
+                "calls":     list(self._calls), # Recent hardware-call durations (s)
+            }
+
+    def shutdown(self):
+        # Sorts after every lane, so queued commands still run first
+        self._queue.put((_STOP, next(self._order), None, None, None, None, None, None, None))
@@ -1,61 +1,412 @@
-from flask import Flask, url_for
+from flask import Flask, url_for, request, Response
 
 from flask_restful import reqparse, abort, Api, Resource
 import redis
-import ast
+import functools
+import inspect
+import json
+import statistics
+import threading
+import time
+from werkzeug.serving import make_server
+from .shadow import ShadowState
+from .codec import Codec
+from .scheduler import CommandScheduler, DeadlineExpired, LANES
+from .jobs import JobTable
+from .stream import stream_lines
 rparser = reqparse.RequestParser()
 rparser.add_argument('value')
 NTRIES = 5
 
+
+def wants_fresh():
+    return request.args.get('fresh', 'false').lower() in ('1', 'true', 'yes')
+
+
+def request_lane():
+    """
+    Scheduling lane and absolute deadline for this request, from the
+    X-Priority and X-Deadline (seconds from now) headers.
+    """
+    lane = request.headers.get('X-Priority', 'interactive')
+    if lane not in LANES:
+        abort(400, message=f'Unknown priority {lane}. Must be one of {list(LANES)}')
+    deadline = request.headers.get('X-Deadline')
+    return lane, (time.time() + float(deadline) if deadline else None)
+
+
+def array_response(val):
+    """Raw little-endian bytes, with dtype and shape in the headers."""
+    import numpy as np
+    arr = np.asarray(val)
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+    return Response(arr.tobytes(), mimetype='application/octet-stream',
+                    headers={'X-Dtype': arr.dtype.str,
+                             'X-Shape': ','.join(map(str, arr.shape))})
+
+
+def write_state(shadow, codec, attrs, state):
+    """
+    Writes {attr: value} through `shadow` in the order given; runs on the
+    device scheduler. Returns {"values", "errors", "readback"}.
+    """
+    values, errors, read_back = {}, {}, []
+    for ep, val in state.items():
+        if ep not in attrs:
+            errors[ep] = f'No attribute named {ep}'
+            continue
+        if not codec.writable(ep):
+            errors[ep] = f'{ep} is read-only'
+            continue
+        try:
+            values[ep], fresh = shadow.write(ep, codec.decode(ep, val))
+            if fresh:
+                read_back.append(ep)
+        except Exception as e:
+            errors[ep] = repr(e)
+    return {"values": values, "errors": errors, "readback": read_back}
+
+
 class RestfulDevice(Resource):
             # dev = self.device
             # attrs = dev.public + dev._common
             def __init__(self, **kwargs):
                 self.device = kwargs['device'] 
+                self.scheduler = kwargs['scheduler']
+                self.shadow = kwargs['shadow']
+                self.codec = kwargs['codec']
                 self.attrs = self.device.public + self.device._common
+                self.binary = self.device.binary
 
             def get(self, ep):
-                if ep in self.attrs:
-                    val = getattr(self.device, ep)
-                    return {"name":ep, "value" : val}
-                else:
-                    abort(f'No attribute named {ep}')
+                lane, deadline = request_lane()
+                try:
+                    if ep in self.binary:
+                        return array_response(self.scheduler.call(getattr, self.device, ep,
+                                                                  lane=lane, deadline=deadline))
+                    if ep in self.attrs:
+                        val, age = self.shadow.get(ep, wants_fresh(), lane, deadline)
+                        return {"name":ep, "value" : val, "age": age}
+                except DeadlineExpired as e:
+                    return {"name": ep, "message": str(e)}, 504
+                abort(404, message=f'No attribute named {ep}')
                 
             def put(self, ep):
                 if ep in self.attrs:
+                    if not self.codec.writable(ep):
+                        return {"name": ep, "message": f'{ep} is read-only'}, 405
                     args = rparser.parse_args()
+                    val = self.codec.decode(ep, args['value'])
+                    lane, deadline = request_lane()
                     try:
-                        val = ast.literal_eval(args['value'])
-                    except:
-                        val = args['value']
-                    try:
-                        setattr(self.device, ep, val)
-                        return {"name":ep, "value" : val}, 201
+                        val, read_back = self.shadow.set(ep, val, lane, deadline)
+                        return {"name":ep, "value" : val, "readback": read_back}, 201
+                    except DeadlineExpired as e:
+                        return {"name": ep, "message": str(e)}, 504
                     except:
                         pass
                     else:
                         return {"name":ep, "value" : val}, 201
                 else:
-                    abort(f'No attribute named {ep}')
+                    abort(404, message=f'No attribute named {ep}')
+
+
+class RestfulDeviceBatch(Resource):
+    """
+    Reads or writes several attributes in one request.
+
+        GET /<name>/_batch?attrs=a,b   (all attributes if omitted)
+        PUT /<name>/_batch  {"values": {"a": 1, "b": 2}}
+
+    Writes are applied in the order given, so list an attribute after
+    the ones it depends on (control before on, save_path before saved).
+    Both return
+    {"values": {...}, "errors": {...}} with one entry per attribute;
+    GET also reports the age of each value in "ages", PUT lists the
+    values read back from the hardware (rather than echoed) in "readback".
+    """
+    def __init__(self, **kwargs):
+        self.device = kwargs['device']
+        self.scheduler = kwargs['scheduler']
+        self.shadow = kwargs['shadow']
+        self.codec = kwargs['codec']
+        self.attrs = self.device.public + self.device._common
+
+    def get(self):
+        names = request.args.get('attrs')
+        names = names.split(',') if names else self.attrs
+        fresh = wants_fresh()
+        cached, missing = {}, []
+        for ep in names:
+            hit = None if fresh or ep not in self.attrs else self.shadow.cached(ep)
+            if hit is None:
+                missing.append(ep)
+            else:
+                cached[ep] = hit
+        lane, deadline = request_lane()
+        try:
+            result = (self.scheduler.call(self._read, missing, lane=lane, deadline=deadline)
+                      if missing else {"values": {}, "errors": {}})
+        except DeadlineExpired as e:
+            return {"message": str(e)}, 504
+        values, ages = {}, {}
+        for ep in names:
+            if ep in cached:
+                values[ep], ages[ep] = cached[ep]
+            elif ep in result["values"]:
+                values[ep], ages[ep] = result["values"][ep], 0.0
+        return {"values": values, "ages": ages, "errors": result["errors"]}
+
+    def put(self):
+        body = request.get_json(force=True, silent=True) or {}
+        lane, deadline = request_lane()
+        try:
+            return self.scheduler.call(self._write, body.get('values', {}),
+                                       lane=lane, deadline=deadline), 201
+        except DeadlineExpired as e:
+            return {"message": str(e)}, 504
+
+    def _read(self, names):
+        values, errors = {}, {}
+        for ep in names:
+            if ep not in self.attrs:
+                errors[ep] = f'No attribute named {ep}'
+                continue
+            try:
+                val = self.shadow.read(ep)
+                json.dumps(val)
+                values[ep] = val
+            except Exception as e:
+                errors[ep] = repr(e)
+        return {"values": values, "errors": errors}
+
+    def _write(self, state):
+        return write_state(self.shadow, self.codec, self.attrs, state)
+
+
+class RestfulDeviceJobs(Resource):
+    """
+    Writes that may take long (exposures, grating moves, power ramps)
+    without holding the request open.
+
+        POST /<name>/_jobs  {"values": {"running": true}}  -> 202 {"id": ...}
+        GET  /<name>/_jobs                                 -> recent jobs
+    """
+    def __init__(self, **kwargs):
+        self.shadow = kwargs['shadow']
+        self.codec = kwargs['codec']
+        self.attrs = kwargs['device'].public + kwargs['device']._common
+        self.jobs = kwargs['jobs']
+
+    def get(self):
+        return self.jobs.list()
+
+    def put(self):
+        # Otherwise routed to the attribute named _jobs
+        return {"message": 'Submit jobs with POST; PUT /<name>/_batch writes synchronously'}, 405
+
+    def post(self):
+        body = request.get_json(force=True, silent=True) or {}
+        lane, deadline = request_lane()
+        job = self.jobs.submit(write_state, self.shadow, self.codec, self.attrs, body.get('values', {}),
+                               lane=lane, deadline=deadline)
+        return job.describe(), 202
+
+
+class RestfulDeviceJob(Resource):
+    """
+    GET    /<name>/_jobs/<id>?wait=10   status, waiting up to `wait` s for it to finish
+    DELETE /<name>/_jobs/<id>           cancel a job that has not started yet
+    """
+    def __init__(self, **kwargs):
+        self.jobs = kwargs['jobs']
+
+    def get(self, id):
+        job = self.jobs.wait(id, min(float(request.args.get('wait', 0)), 60))
+        if job is None:
+            abort(404, message=f'No job {id}')
+        return job.describe()
+
+    def delete(self, id):
+        job = self.jobs.get(id)
+        if job is None:
+            abort(404, message=f'No job {id}')
+        if not self.jobs.cancel(id):
+            return job.describe(), 409
+        return job.describe()
+
+
+class RestfulDeviceCall(Resource):
+    """
+    POST /<name>/_calls/<method>  {"kwargs": {...}}  -> {"value": ...}
+
+    Runs one of the device's `calls` with arguments on its scheduler, for
+    measurements that take parameters or too long to be attributes.
+    """
+    def __init__(self, **kwargs):
+        self.device = kwargs['device']
+        self.scheduler = kwargs['scheduler']
+
+    def post(self, method):
+        if method not in self.device.calls:
+            abort(404, message=f'No call named {method}')
+        body = request.get_json(force=True, silent=True) or {}
+        fn, kwargs = getattr(self.device, method), body.get('kwargs', {})
+        try:
+            inspect.signature(fn).bind(**kwargs)
+        except TypeError as e:
+            return {"message": f'{method}: {e}'}, 400
+        lane, deadline = request_lane()
+        try:
+            value = self.scheduler.call(functools.partial(fn, **kwargs), lane=lane, deadline=deadline)
+        except DeadlineExpired as e:
+            return {"message": str(e)}, 504
+        except Exception as e:
+            return {"message": repr(e)}, 500
+        return {"name": method, "value": value}
+
+
+class RestfulDeviceSchema(Resource):
+    """GET /<name>/_schema: type, access and unit of every attribute."""
+    def __init__(self, **kwargs):
+        self.schema = kwargs['codec'].schema
+
+    def get(self):
+        return self.schema
+
+
+class RestfulDeviceQueue(Resource):
+    """GET /<name>/_queue: scheduler depth per lane, wait times and call durations."""
+    def __init__(self, **kwargs):
+        self.scheduler = kwargs['scheduler']
+
+    def get(self):
+        return self.scheduler.metrics()
+
+
+class RestfulStream(Resource):
+    """
+    GET /_stream?attrs=spectro.wavelength,pm.power&period=1&changes=true
+
+    One long-lived response of JSON lines, one per new value, for any
+    attributes of the devices on this server. `period` (s) also samples
+    the attributes at that rate; `changes` drops repeated values.
+    """
+    def __init__(self, **kwargs):
+        self.shadows = kwargs['shadows']
+
+    def get(self):
+        wanted = {}
+        for item in request.args.get('attrs', '').split(','):
+            name, _, attr = item.partition('.')
+            shadow = self.shadows.get(name)
+            if shadow is None:
+                abort(400, message=f'No device named {name}')
+            device = shadow.device
+            if attr not in device.public + device._common or attr in device.binary:
+                abort(400, message=f'{name} has no streamable attribute {attr}')
+            wanted.setdefault(name, []).append(attr)
+        period = request.args.get('period')
+        changes = request.args.get('changes', 'false').lower() in ('1', 'true', 'yes')
+        return Response(stream_lines(self.shadows, wanted, float(period) if period else None, changes),
+                        mimetype='application/x-ndjson')
+
+
+def add_stream(api, shadows):
+    """Expose /_stream for all devices in `shadows` ({name: ShadowState})."""
+    api.add_resource(RestfulStream, '/_stream', endpoint='_stream',
+                     resource_class_kwargs={"shadows": shadows})
+
+
+class RestfulDeviceHealth(Resource):
+    """
+    GET /<name>/_health: whether the device is connected, the median
+    duration of its recent hardware calls and how long the probe queued
+    behind other commands.
+    """
+    def __init__(self, **kwargs):
+        self.device = kwargs['device']
+        self.scheduler = kwargs['scheduler']
+
+    def _connected(self):
+        return bool(self.device.connected), time.time()
+
+    def get(self):
+        lane, deadline = request_lane()
+        metrics = self.scheduler.metrics()
+        health = {"connected": False,
+                  "call_latency": statistics.median(metrics["calls"]) if metrics["calls"] else None,
+                  "queue_wait": None, "depth": sum(metrics["depth"].values())}
+        t0 = time.time()
+        try:
+            health["connected"], started = self.scheduler.call(
+                self._connected, lane=lane, deadline=deadline, record=False)
+            health["queue_wait"] = started - t0
+        except DeadlineExpired as e:
+            health["error"] = str(e)
+            return health, 504
+        except Exception as e:
+            health["error"] = repr(e)
+        return health
+
+
+def public_addr(host, port, name):
+    return f'http://{"localhost" if host in ("", "0.0.0.0") else host}:{port}/{name}'
+
+
+def add_device(api, name, device, scheduler, shadow):
+    """Expose `device` under /<name>/ on a flask-restful Api."""
+    device.scheduler = scheduler
+    codec = Codec(device.describe())
+    kwargs = {"device": device, "scheduler": scheduler, "shadow": shadow, "codec": codec,
+              "jobs": JobTable(scheduler)}
+    api.add_resource(RestfulDeviceQueue, f'/{name}/_queue',
+                     endpoint=f'{name}_queue', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceHealth, f'/{name}/_health',
+                     endpoint=f'{name}_health', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceSchema, f'/{name}/_schema',
+                     endpoint=f'{name}_schema', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceBatch, f'/{name}/_batch',
+                     endpoint=f'{name}_batch', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceJobs, f'/{name}/_jobs',
+                     endpoint=f'{name}_jobs', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceJob, f'/{name}/_jobs/<id>',
+                     endpoint=f'{name}_job', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDeviceCall, f'/{name}/_calls/<method>',
+                     endpoint=f'{name}_call', resource_class_kwargs=kwargs)
+    api.add_resource(RestfulDevice, f'/{name}/<ep>',
+                     endpoint=name, resource_class_kwargs=kwargs)
+
+
 class DeviceServer:
 
-    def __init__(self, name, host, port, device, rs=None):
+    def __init__(self, name, host, port, device, rs=None, shadow=None, registry=None):
         self.name = name
         self.host = host
         self.port = port
         self.device = device
         self.rs = rs
+        self.shadow = shadow # {attribute: refresh period in seconds}
+        self.registry = registry
         
     def run(self, debug=False):
         app = Flask(__name__)
         api = Api(app)
-        api.add_resource(RestfulDevice, f'/{self.name}/<ep>',
-                    resource_class_kwargs={"device": self.device})
+        scheduler = CommandScheduler(self.name)
+        shadow = ShadowState(self.device, scheduler, self.shadow, self.name)
+        add_device(api, self.name, self.device, scheduler, shadow)
+        add_stream(api, {self.name: shadow})
 
         try:
-            self.device.connect()
+            if self.registry is not None:
+                self.registry.publish(self.name, public_addr(self.host, self.port, self.name),
+                                      self.device.describe())
+            scheduler.call(self.device.connect)
+            shadow.start()
             if self.rs is not None:
                 self.rs.set(self.name, f'{self.host}:{self.port}')
+            if self.registry is not None:
+                self.registry.set_ready(self.name, self.device.connected)
             app.run(host=self.host, port=self.port, debug=debug)
             if self.rs is not None:
                 self.rs.delete(self.name)
@@ -69,7 +420,100 @@ class DeviceServer:
             else:
                 print('Exception raised. Closing down gracefully...')
         finally:
+            if self.registry is not None:
+                self.registry.remove(self.name)
+            shadow.stop()
             if self.device.connected:
                 self.device.disconnect()
+            scheduler.shutdown()
+
+
+class DeviceGateway:
+    """
+    Hosts many devices in one process behind one port, using the
+    same /<name>/<ep> routes as DeviceServer. Each device gets its
+    own CommandScheduler thread.
+
+    `aliases` are extra ports served by the same app, e.g. the
+    5000+i ports that SystemClient.from_json_file expects.
+    `shadow` maps device name -> {attribute: refresh period}.
+    """
+
+    def __init__(self, host, port, devices: dict, rs=None, aliases=(), shadow=None, registry=None):
+        self.host = host
+        self.port = port
+        self.devices = devices
+        self.rs = rs
+        self.aliases = [p for p in aliases if p != port]
+        self.shadow = shadow or {}
+        self.registry = registry
+
+    def _connect_all(self, schedulers):
+        futures = {name: schedulers[name].submit(dev.connect)
+                   for name, dev in self.devices.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+                ok = self.devices[name].connected
+            except Exception:
+                ok = False
+            print(f"  {'OK  ' if ok else '!!!FAIL!!!'} {name}")
+
+    def run(self, debug=False):
+        app = Flask(__name__)
+        api = Api(app)
+        schedulers = {name: CommandScheduler(name) for name in self.devices}
+        shadows = {name: ShadowState(device, schedulers[name], self.shadow.get(name), name)
+                   for name, device in self.devices.items()}
+        for name, device in self.devices.items():
+            add_device(api, name, device, schedulers[name], shadows[name])
+        add_stream(api, shadows)
+
+        servers = [make_server(self.host, port, app, threaded=True) for port in self.aliases]
+        for srv in servers:
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+        try:
+            if self.registry is not None:
+                for name, device in self.devices.items():
+                    self.registry.publish(name, public_addr(self.host, self.port, name), device.describe())
+            self._connect_all(schedulers)
+            for shadow in shadows.values():
+                shadow.start()
+            if self.rs is not None:
+                for name in self.devices:
+                    self.rs.set(name, f'{self.host}:{self.port}')
+            if self.registry is not None:
+                for name, device in self.devices.items():
+                    self.registry.set_ready(name, device.connected)
+            print(f"gateway running on {self.host}:{self.port} "
+                  f"(aliases: {', '.join(map(str, self.aliases)) or 'none'})")
+            app.run(host=self.host, port=self.port, debug=debug, use_reloader=False)
+
+        except KeyboardInterrupt:
+            print('User requested stop. Closing down gracefully...')
+
+        except Exception as e:
+            if debug:
+                print(e)
+            else:
+                print('Exception raised. Closing down gracefully...')
+        finally:
+            for srv in servers:
+                srv.shutdown()
+            for shadow in shadows.values():
+                shadow.stop()
+            if self.rs is not None:
+                for name in self.devices:
+                    self.rs.delete(name)
+            if self.registry is not None:
+                for name in self.devices:
+                    self.registry.remove(name)
+            for name, device in self.devices.items():
+                try:
+                    if device.connected:
+                        device.disconnect()
+                except Exception:
+                    pass
+                schedulers[name].shutdown()
 
 
@@ -0,0 +1,151 @@
+import threading
+import time
+from .stream import Broadcaster
+
+
+class ShadowState:
+    """
+    Server-side copy of a device's slowly changing attributes.
+
+    `periods` maps attribute -> refresh period in seconds. A background
+    poller re-reads each attribute at that rate, and a cached value is
+    only served while it is younger than its period. Writes read the
+    attribute back and drop anything listed in `device.invalidates`.
+    Attributes without a period always go to the hardware.
+
+    Every value read or written is published on `events`; stream
+    subscribers can ask for more attributes to be sampled with sample().
+    """
+    def __init__(self, device, scheduler, periods=None, name=None):
+        self.device = device
+        self.scheduler = scheduler
+        self.name = name or type(device).__name__
+        self.periods = dict(getattr(device, 'shadow', {}))
+        self.periods.update(periods or {})
+        self.events = Broadcaster()
+        self._samples = {} # attribute -> sampling periods requested by subscribers
+        self._values = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def cached(self, attr):
+        """(value, age) if a fresh enough copy is held, else None."""
+        if attr not in self.periods:
+            return None
+        with self._lock:
+            entry = self._values.get(attr)
+        if entry is None:
+            return None
+        age = time.time() - entry[1]
+        if age > self.periods[attr]:
+            return None
+        return entry[0], age
+
+    def latest(self, attr):
+        """(value, time) of the last read or write, however old."""
+        with self._lock:
+            return self._values.get(attr)
+
+    def _store(self, attr, val):
+        t = time.time()
+        with self._lock:
+            self._values[attr] = (val, t)
+        self.events.publish({"device": self.name, "attr": attr, "value": val, "t": t})
+
+    def invalidate(self, attr):
+        with self._lock:
+            self._values.pop(attr, None)
+
+    def read(self, attr):
+        """Hardware read; runs on the device scheduler."""
+        val = getattr(self.device, attr)
+        self._store(attr, val)
+        return val
+
+    def write(self, attr, val):
+        """
+        Hardware write; runs on the device scheduler. Returns (value,
+        read_back): shadowed attributes are read back from the hardware,
+        anything else echoes `val` with read_back False.
+        """
+        setattr(self.device, attr, val)
+        if attr == 'port':
+            # Reconnected: nothing held is known to be current
+            with self._lock:
+                self._values.clear()
+        for dep in getattr(self.device, 'invalidates', {}).get(attr, ()):
+            self.invalidate(dep)
+        if attr in self._schedule():
+            return self.read(attr), True
+        self._store(attr, val)
+        return val, False
+
+    def get(self, attr, fresh=False, lane='interactive', deadline=None):
+        """Returns (value, age in seconds)."""
+        if attr in self.periods and not fresh:
+            cached = self.cached(attr)
+            if cached is not None:
+                return cached
+        return self.scheduler.call(self.read, attr, lane=lane, deadline=deadline), 0.0
+
+    def set(self, attr, val, lane='interactive', deadline=None):
+        return self.scheduler.call(self.write, attr, val, lane=lane, deadline=deadline)
+
+    def sample(self, attrs, period):
+        with self._lock:
+            for attr in attrs:
+                self._samples.setdefault(attr, []).append(period)
+        self._wake.set()
+
+    def unsample(self, attrs, period):
+        with self._lock:
+            for attr in attrs:
+                periods = self._samples.get(attr, [])
+                if period in periods:
+                    periods.remove(period)
+                if not periods:
+                    self._samples.pop(attr, None)
+
+    def _schedule(self):
+        """Attribute -> poll period: shadowed attributes plus subscriber samples."""
+        schedule = dict(self.periods)
+        with self._lock:
+            for attr, periods in self._samples.items():
+                schedule[attr] = min(periods + [schedule.get(attr, periods[0])])
+        return schedule
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread = None
+
+    def _poll(self):
+        while not self._stop.is_set():
+            if not self.device.connected:
+                self._stop.wait(1.0)
+                continue
+            now = time.time()
+            wait = 1.0
+            for attr, period in self._schedule().items():
+                with self._lock:
+                    entry = self._values.get(attr)
+                # Refresh slightly early so served values stay within their period
+                due = 0 if entry is None else period - (now - entry[1])
+                if due <= 0.1 * period:
+                    try:
+                        self.scheduler.call(self.read, attr, lane='background')
+                    except Exception:
+                        pass
+                    due = period
+                wait = min(wait, max(due - 0.1 * period, 0.01))
+            self._wake.wait(wait)
+            self._wake.clear()
@@ -0,0 +1,85 @@
+import json
+import queue
+import threading
+
+_MISSING = object()
+
+
+class Broadcaster:
+    """
+    Fans attribute updates out to stream subscribers. Each subscriber
+    has a bounded queue; a subscriber that falls behind loses samples
+    rather than slowing down the device.
+    """
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, q=None):
+        """Returns the queue events are put on; pass `q` to share one queue between devices."""
+        if q is None:
+            q = queue.Queue(self.maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass
+
+
+def stream_lines(shadows, wanted, period=None, changes=False, heartbeat=15.0):
+    """
+    JSON lines of {"device", "attr", "value", "t"} for the attributes in
+    `wanted` ({device: [attrs]}). With `period` the attributes are also
+    sampled at that rate; with `changes` only new values are sent.
+    An empty line is sent every `heartbeat` s so dead clients are noticed.
+    """
+    q = queue.Queue(1000)
+    hubs = {name: shadows[name].events for name in wanted}
+    for hub in hubs.values():
+        hub.subscribe(q)
+    if period:
+        for name, attrs in wanted.items():
+            shadows[name].sample(attrs, period)
+    last = {}
+    try:
+        # Current values first, so subscribers start from a full picture
+        for name, attrs in wanted.items():
+            for attr in attrs:
+                entry = shadows[name].latest(attr)
+                if entry is not None:
+                    q.put({"device": name, "attr": attr, "value": entry[0], "t": entry[1]})
+        while True:
+            try:
+                event = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield '\n'
+                continue
+            name, attr = event["device"], event["attr"]
+            if attr not in wanted.get(name, ()):
+                continue
+            if changes:
+                if last.get((name, attr), _MISSING) == event["value"]:
+                    continue
+                last[(name, attr)] = event["value"]
+            try:
+                yield json.dumps(event) + '\n'
+            except TypeError:
+                yield json.dumps(dict(event, value=repr(event["value"]))) + '\n'
+    finally:
+        for hub in hubs.values():
+            hub.unsubscribe(q)
+        if period:
+            for name, attrs in wanted.items():
+                shadows[name].unsample(attrs, period)
@@ -14,17 +14,22 @@ operation of the 3CS experimental setup.
 # -- libraries --- #
 
 # Devserve
-from devserve.clients import SystemClient
-# Instantiate
-s = SystemClient.from_json_file("localhost", "D:3CS/CTRL/Server/dev_config.json")
-
-# power meter libraries
-import visa
-from ThorlabsPM100 import ThorlabsPM100
-
-# Horiba
-import usb.core
-import struct
+from devserve.clients import SystemClient, LazySystemClient
+# Instantiate. Connects on first use, so analysis-only imports stay offline
+s = LazySystemClient.from_json_file("localhost", "D:3CS/CTRL/Server/dev_config.json")
+# Settings only this library changes; gather_metadata reads them back from
+# the client cache, which every write here refreshes with the value the
+# server read back from the hardware
+s.configure(lambda system: system.enable_cache({
+    'spfw':          {'position': 60},
+    'lpfw':          {'position': 60},
+    'lpfw2':         {'position': 60},
+    'horiba':        {'gr': 60, 'wl': 60},
+    'spectro':       {'grating': 60},
+    'power_meter_b': {'unit': 60, 'count': 60, 'wavelength': 60},
+}))
+
+# scipy and matplotlib are imported inside the functions that use them
 import time
 
 # OS
@@ -33,11 +38,12 @@ import json
 from datetime import datetime
 import re
 import numpy as np
-from scipy import interpolate
-import matplotlib.pyplot as plt
 
 # -- -------- --- #
 
+# Writes that apply_state must finish before any other device moves
+SHUTTERS_FIRST = ['source_shutter.control', 'source_shutter.on', 'spectro.shutter']
+
 ##   REQUIRED VARIABLES FROM CONFIG FILE   ##
 
 # PATH_TO_SINGLE
@@ -126,36 +132,25 @@ def zero():
     
     print("Zeroing... this may take a minute.")
     print()
-    print(rf'Setting source power to {source_power}%...')
-    s.source.power = source_power
-    print('Setting computer shutter control...')
-    s.source_shutter.control = "computer"
-    print('Making sure the source and spectrometer shutter are closed...')
-    s.source_shutter.on = False
-    s.spectro.shutter = "closed"
-    print('Making sure both flippers are down...')
-    s.flipper.position = "down"
-    s.flipperB.position = "down"
-    s.spectro.shutter = "closed"
-    print(rf'Setting all the filters to {spfw}...')
-    s.spfw.position = spfw
-    s.lpfw.position = lpfw
-    s.lpfw2.position = lpfw2
-    print(rf"Setting exposure time to {t_exp} seconds...")
-    s.spectro.exposure = t_exp
-    print(rf"Setting spectrometer slit width to {slit} microns...")
-    s.spectro.slit_width = slit
-    print(rf"Setting spectrometer wavelength to {spec_wl}...")
-    s.spectro.wavelength = spec_wl
-    print(rf"Setting spectrometer grating to {spec_gr}...")
-    s.spectro.grating = spec_gr
-    print(rf"Setting monochromator wavelength to {mono_wl}...")
-    s.horiba.wl = mono_wl
-    print(rf"Setting monochromator grating to {mono_gr}...")
-    s.horiba.gr = mono_gr
-    print(rf"Setting power meter wavelengths to match the monochromator...")
-    s.power_meter_a.wavelength = mono_wl
-    s.power_meter_b.wavelength = mono_wl
+    # Shutters close before anything moves; the rest move in parallel
+    report = s.apply_state({
+        'source_shutter': {'control': "computer", 'on': False},
+        'spectro':        {'shutter': "closed", 'exposure': t_exp, 'slit_width': slit,
+                           'wavelength': spec_wl, 'grating': spec_gr},
+        'source':         {'power': source_power},
+        'flipper':        {'position': "down"},
+        'flipperB':       {'position': "down"},
+        'spfw':           {'position': spfw},
+        'lpfw':           {'position': lpfw},
+        'lpfw2':          {'position': lpfw2},
+        'horiba':         {'wl': mono_wl, 'gr': mono_gr},
+        'power_meter_a':  {'wavelength': mono_wl},
+        'power_meter_b':  {'wavelength': mono_wl},
+    }, stages=[SHUTTERS_FIRST])
+    for name, attrs in report["skipped"].items():
+        print(rf'{name}: {", ".join(attrs)} already set')
+    for name, duration in report["critical_path"]:
+        print(rf'Slowest move: {name} ({duration:.1f} s)')
     print("All done. System zeroed")
     print()
 
@@ -453,10 +448,20 @@ simply plots the signal in a convenient form
 """
 def plot_signal(path,save_path,startline,split=None,colour='darkred',xl = r'Wavelength $[nm]$',yl = 'Photon Count',title = rf'Exposure Signal',save=False):
     
-    plt.rcParams["figure.figsize"] = 12, 4
-    
     x,y = read_xy(path,startline,split)
     
+    return plot_spectrum(x,y,save_path,colour,xl,yl,title,save)
+
+
+
+"""
+plots x,y arrays already in memory, e.g. a spectrum fetched from the spectrometer server
+"""
+def plot_spectrum(x,y,save_path='',colour='darkred',xl = r'Wavelength $[nm]$',yl = 'Photon Count',title = rf'Exposure Signal',save=False):
+    import matplotlib.pyplot as plt
+    
+    plt.rcParams["figure.figsize"] = 12, 4
+    
     plt.plot(x,y,color=colour)
     plt.xlabel(xl)
     plt.ylabel(yl)
@@ -552,11 +557,27 @@ def make_standard(spec_file, data,save_path):
     return None
 
 
+"""
+writes the standard file format (metadata, spectrometer header and signal) in a single pass,
+from a spectrum held in memory rather than a raw spectrometer file
+"""
+def write_standard(data, header, spectrum, save_path):
+    
+    with open(save_path,'x') as fp:
+        fp.write(data)
+        fp.write(header)
+        np.savetxt(fp, np.asarray(spectrum).T, fmt='%.7g')
+    print(rf'Saved signal to: {save_path} .')
+    
+    return None
+
+
 """
 takes an exposure without regard to any settings, for simple user interface.
 if baseline set to True, then the shutters remain closed
 """
 def take_exposure(baseline=False):
+    import matplotlib.pyplot as plt
 
     if baseline == False:
 
@@ -583,19 +604,12 @@ def take_exposure(baseline=False):
     print('Generating plot...')
     # generate unique date id
     now  = date_id()
-    temp_id = rf'exp_{now}'
-    
-    # save file while making sure of no overrides
-    count = 1
-    file_path = os.path.join(path_to_single,rf'{temp_id}_(0).txt')
-    while os.path.exists(file_path) == True:
-        file_path = os.path.join(path_to_single,rf'{temp_id}_({count}).txt')
-        count+=1
 
-    s.spectro.save_path = file_path
-    s.spectro.saved = True
+    # the signal stays in memory until it is saved
+    spectrum = s.spectro.spectrum
+    header = s.spectro.spectrum_header
     
-    plot_signal(file_path,'',31)
+    plot_spectrum(spectrum[0],spectrum[1])
     
     time.sleep(1)
     
@@ -618,18 +632,15 @@ def take_exposure(baseline=False):
 
         save_path =  os.path.join(folder_path,rf'{perm_id}.txt')
         data = gather_metadata(powerval)
-        make_standard(file_path,data,save_path)
+        write_standard(data,header,spectrum,save_path)
 
         fig_path = os.path.join(folder_path,rf'{crystal}_plot.png')
-        plot_signal(save_path,fig_path,start,title=rf'{perm_id}',save=True)
+        plot_spectrum(spectrum[0],spectrum[1],fig_path,title=rf'{perm_id}',save=True)
         plt.close()
         
-        os.remove(file_path)
-        
         return save_path
         
     else:
-        os.remove(file_path)
         print()
         print('Did not save signal.')
         
@@ -688,10 +699,11 @@ def take_power(min_wl, max_wl,step):
             s.power_meter_a.wavelength = wl
             s.power_meter_b.wavelength = wl
 
-            #get power reading
+            #get power reading, both meters at once
             print('Getting power...')
-            power_read_a = s.power_meter_a.power
-            power_read_b = s.power_meter_b.power
+            record = s.read_paired(('power_meter_a', 'power_meter_b'))
+            power_read_a = record['power_meter_a']
+            power_read_b = record['power_meter_b']
 
             #save measurement
             save_string(str(wl)+' ',path,False)
@@ -715,6 +727,8 @@ analyses the power ratio between B and A, and returns two interpolated functions
 of wavelength, one for each monochromator grating.
 """
 def analyse_power(pow_id):
+    from scipy import interpolate
+    import matplotlib.pyplot as plt
     
     file0_path = rf'D:/3CS/DATA/PowerCorrelations/{pow_id}/pow_gr{0}.txt'
     file1_path = rf'D:/3CS/DATA/PowerCorrelations/{pow_id}/pow_gr{1}.txt'
@@ -776,6 +790,7 @@ takes two inputs: the path of signal to be corrected and the power id of the spe
 and returns the corrected array (wl vs photon_per_photon) together with its metadata from the signal path
 """
 def correct_power(sig_path,pow_id,save_path):
+    import matplotlib.pyplot as plt
     
     # get the interpolated power ratios
     fun0, fun1 = analyse_power(pow_id)
@@ -858,16 +873,15 @@ def take_baseline(folder_path,t,spec_wl,spec_gr):
     now = date_id()
     baseline_id = rf'BL_{now}_{t}sec_{spec_wl}wl_{spec_gr}gr'
 
-    temp_path = os.path.join(folder_path,'temp.txt')
     save_path = os.path.join(folder_path,rf'{baseline_id}.txt')
     
     print('Taking exposure...')
     s.spectro.running  = True
-    s.spectro.save_path = temp_path
-    s.spectro.saved = True
+    spectrum = s.spectro.spectrum
+    header = s.spectro.spectrum_header
     
     data = gather_metadata(0,baseline=True)
-    make_standard(temp_path,data,save_path)
+    write_standard(data,header,spectrum,save_path)
     
     return save_path
 
@@ -893,6 +907,7 @@ def poly2(x,a,b,c):
 analyses a baseline measurement signal and returns a fourth order best fit polynomial
 """
 def analyse_baseline(bl_path):
+    import matplotlib.pyplot as plt
     
     x,y = read_xy(bl_path,start)
     pixel_array = np.arange(0,1600,1)
@@ -915,6 +930,7 @@ def analyse_baseline(bl_path):
 takes a signal and baseline measurement as input, and saves a baseline-subtracted signal
 """
 def subtract_baseline(sig_path, bl_path,save_path):
+    import matplotlib.pyplot as plt
 
     
     sig_wl,sig_count = read_xy(sig_path,start)
@@ -972,6 +988,7 @@ def construct_heatmap(directory):
     from statistics import mean
     import pandas as pd
     import seaborn as sns
+    import matplotlib.pyplot as plt
     import matplotlib.ticker as ticker
     
     # maximum wavelength of the spectrograph